@@ -8,6 +8,7 @@ Usage:
 
 import os
 import os.path as op
+import sys
 import argparse
 import numpy as np
 import pandas as pd
@@ -15,6 +16,10 @@ import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
+# The shared GALAS modules live at the repository root
+sys.path.insert(0, op.abspath(op.join(op.dirname(__file__), "..", "..", "..", "..")))
+import defect_types
+
 
 def ensure_dir(path):
     if not op.isdir(path):
@@ -42,48 +47,14 @@ def load_component_csvs(data_path):
 
 # ---------- Defect classification helpers ----------
 
-DEFECT_SIGNATURES_FCC = {
-    "Mono-vacancy": (12, 24),
-    "Di-vacancy": (18, 40),
-    "Tri-vacancy (linear)": (24, 60),
-    "Tri-vacancy (triangular)": (24, 54),
-}
-
-ADJACENT_MONOVAC_NODES = {
-    "Adjacent mono-vac (square face, 4 shared)": 20,
-    "Adjacent mono-vac (triangle face, 3 shared)": 21,
-    "Adjacent mono-vac (face edge, 2 shared)": 22,
-    "Adjacent mono-vac (face corner, 1 shared)": 23,
-}
-
-
-def classify_components(comp_df):
-    """Classify components by matching (Nodes, Edges) signatures.
-    Returns a dict of {defect_type: count} and a list of per-component records."""
-    counts = {k: 0 for k in DEFECT_SIGNATURES_FCC}
-    counts.update({k: 0 for k in ADJACENT_MONOVAC_NODES})
-    counts["Unclassified"] = 0
-
-    records = []
-    for _, row in comp_df.iterrows():
-        n, e = int(row["Nodes"]), int(row["Edges"])
-        classified = False
-        for name, (sig_n, sig_e) in DEFECT_SIGNATURES_FCC.items():
-            if n == sig_n and e == sig_e:
-                counts[name] += 1
-                records.append({"Component": int(row["Component"]), "Nodes": n, "Edges": e, "Type": name})
-                classified = True
-                break
-        if not classified:
-            for name, sig_n in ADJACENT_MONOVAC_NODES.items():
-                if n == sig_n:
-                    counts[name] += 1
-                    records.append({"Component": int(row["Component"]), "Nodes": n, "Edges": e, "Type": name})
-                    classified = True
-                    break
-        if not classified:
-            counts["Unclassified"] += 1
-            records.append({"Component": int(row["Component"]), "Nodes": n, "Edges": e, "Type": "Unclassified"})
+def classify_components(comp_df, signatures):
+    """Classify components by their Type column (written by generate_components.py),
+    or else by matching (Nodes, Edges) signatures.
+    Returns a dict of {defect_type: count} (GBS excluded) and a list of per-component records."""
+    types = comp_df["Type"] if "Type" in comp_df else defect_types.classify_components(comp_df, signatures)
+    counts = defect_types.type_counts(types, signatures).to_dict()
+    records = pd.DataFrame({"Component": comp_df["Component"].astype(int), "Nodes": comp_df["Nodes"].astype(int),
+                            "Edges": comp_df["Edges"].astype(int), "Type": types}).to_dict("records")
     return counts, records
 
 
@@ -148,16 +119,16 @@ def plot_trajectory_gbs_vs_defects(all_comp_df, output_dir):
     plt.close(fig)
 
 
-def plot_trajectory_defect_counts(comp_csvs, output_dir):
+def plot_trajectory_defect_counts(comp_csvs, output_dir, signatures):
     """Line plot of each defect type count across frames."""
     if not comp_csvs:
         return
 
     frame_names = sorted(comp_csvs.keys())
-    type_counts_over_time = {k: [] for k in list(DEFECT_SIGNATURES_FCC) + list(ADJACENT_MONOVAC_NODES) + ["Unclassified"]}
+    type_counts_over_time = {k: [] for k in defect_types.defect_types(signatures)}
 
     for fname in frame_names:
-        counts, _ = classify_components(comp_csvs[fname])
+        counts, _ = classify_components(comp_csvs[fname], signatures)
         for dtype in type_counts_over_time:
             type_counts_over_time[dtype].append(counts.get(dtype, 0))
 
@@ -193,9 +164,9 @@ def plot_trajectory_total_components(all_comp_df, output_dir):
 
 # ---------- Summary table ----------
 
-def print_single_frame_summary(comp_df, frame_label=""):
+def print_single_frame_summary(comp_df, signatures, frame_label=""):
     """Print a summary table for a single frame."""
-    counts, records = classify_components(comp_df)
+    counts, records = classify_components(comp_df, signatures)
     total_defect_atoms = comp_df["Nodes"].sum()
     gbs_atoms = comp_df.iloc[0]["Nodes"] if len(comp_df) > 0 else 0
     n_components = len(comp_df) - 1  # exclude GBS
@@ -224,7 +195,12 @@ def main():
     parser.add_argument("--single_frame", type=str, default=None,
                         help="Analyze only this frame (filename in components/csvs/, e.g. dump.0.txt.csv)")
     parser.add_argument("--output", type=str, default=None, help="Output directory for figures")
+    parser.add_argument("--lattice", type=str, default="FCC", choices=list(defect_types.SIGNATURES),
+                        help="Lattice whose defect signatures classify components without a Type column")
+    parser.add_argument("--signatures", type=str, default=None,
+                        help="JSON file of defect signatures {type: [nodes, edges]} replacing the built-in ones")
     args = parser.parse_args()
+    signatures = defect_types.load_signatures(args.lattice, args.signatures)
 
     output_dir = args.output or op.join(args.path, "figures")
     ensure_dir(output_dir)
@@ -237,7 +213,7 @@ def main():
             return
         comp_df = pd.read_csv(csv_path)
         label = args.single_frame.replace(".csv", "")
-        counts, records = print_single_frame_summary(comp_df, label)
+        counts, records = print_single_frame_summary(comp_df, signatures, label)
         plot_component_size_distribution(comp_df, output_dir, label)
         plot_defect_type_bar(counts, output_dir, label)
 
@@ -257,7 +233,7 @@ def main():
         # Per-frame summaries
         for fname, cdf in comp_csvs.items():
             label = fname.replace(".csv", "")
-            counts, records = print_single_frame_summary(cdf, label)
+            counts, records = print_single_frame_summary(cdf, signatures, label)
             plot_component_size_distribution(cdf, output_dir, label)
             plot_defect_type_bar(counts, output_dir, label)
             rec_df = pd.DataFrame(records)
@@ -265,7 +241,7 @@ def main():
 
         # Trajectory-level plots
         plot_trajectory_gbs_vs_defects(all_comp_df, output_dir)
-        plot_trajectory_defect_counts(comp_csvs, output_dir)
+        plot_trajectory_defect_counts(comp_csvs, output_dir, signatures)
         plot_trajectory_total_components(all_comp_df, output_dir)
 
         print(f"\n  All figures saved to: {output_dir}/")
@@ -0,0 +1,90 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+
+import os
+import os.path as op
+import numpy as np
+import logging
+import argparse
+from galas_io import frame_sort_key, find_atom_table, read_atom_table, TrajectoryStore, Manifest
+
+parser = argparse.ArgumentParser(description='Collect per-atom time series of all frames into a chunked trajectory store')
+parser.add_argument('--path', type=str, default='./data/', 
+                    help='Path to data folder')
+parser.add_argument('--frame_chunk', type=int, default=32,
+                    help='Frames per chunk (used when the store is created)')
+parser.add_argument('--atom_chunk', type=int, default=1 << 16,
+                    help='Atoms per chunk (used when the store is created)')
+parser.add_argument('--overwrite', action='store_true',
+                    help='Rewrite frames that the manifest records as up to date')
+
+STORE_COLUMNS = ['idx', 'n_neighbors', 'summed_neighbor_distances', 'structure_type']
+
+
+def component_labels(n_atoms, defect_indices, labels):
+    """Component label of every row of a frame (-1 for non-defect atoms)."""
+    component = np.full(n_atoms, -1, dtype=np.int32)
+    component[defect_indices] = labels
+    return component
+
+
+def frame_inputs(path, frame):
+    """Per-atom table and (if present) component metadata of a frame."""
+    inputs = [find_atom_table(path, frame)]
+    meta_path = op.join(path, 'components', frame + '.meta.npz')
+    if op.isfile(meta_path):
+        inputs.append(meta_path)
+    return inputs
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    data_path = op.join(args.path, 'graphs')
+    all_frames = sorted([f.replace('.npz', '') for f in os.listdir(data_path) if f.endswith('.npz')],
+                        key=frame_sort_key)
+    logging.info(f'{len(all_frames)} to total frames in {data_path}')
+
+    store = TrajectoryStore(args.path, args.frame_chunk, args.atom_chunk)
+    manifest = Manifest(args.path)
+    params = {'frame_chunk': store.frame_chunk, 'atom_chunk': store.atom_chunk}
+
+    # Append every new or changed frame as soon as it is read
+    for frame in all_frames:
+        try:
+            inputs = frame_inputs(args.path, frame)
+        except FileNotFoundError:
+            logging.warning(f'... no per-atom table for {frame}')
+            continue
+        if not args.overwrite and frame in store.frames and \
+                manifest.is_fresh(frame, 'trajectory_store', inputs, params):
+            continue
+
+        logging.info(f'Adding {frame} to the trajectory store')
+        df = read_atom_table(inputs[0], columns=STORE_COLUMNS)
+        values = {column: df[column].values for column in STORE_COLUMNS[1:]}
+        if len(inputs) > 1:
+            meta = np.load(inputs[1])
+            values['component'] = component_labels(len(df), meta['defect_indices'], meta['labels'])
+        store.append(frame, df['idx'].values, values)
+        manifest.record(frame, 'trajectory_store', inputs, params, [store.header_path])
+    logging.info(f'... {len(store.frames)} frames of {store.n_atoms} atoms in {store.root}')
@@ -23,9 +23,11 @@ import numpy as np
 import pandas as pd
 import os
 import os.path as op
+import re
 import pickle
 import logging
 import argparse
+from galas_io import frame_sort_key, find_atom_table, read_atom_table, load_atom_index, atom_rows
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--path', type=str, default='./data/', 
@@ -36,33 +38,64 @@ parser.add_argument('--n_nodes', type=int, default=12,
                     help='Number of nodes ideal defect')
 parser.add_argument('--n_edges', type=int, default=24,
                     help='Number of edges in ideal defect')
+parser.add_argument('--columns', type=str, nargs='*', default=None,
+                    help='Per-atom table columns written to the defect histories (default: all)')
 args = parser.parse_args()
 
 
 with open(op.join(args.path, 'defects', f'defect_dict_{args.n_nodes}nodes_{args.n_edges}edges_startat{args.start}.pickle'), 'rb') as handle:
     defect_dict=pickle.load(handle)
 
-component = list(defect_dict.keys())
+# Union of the atoms of all tracked components (rows of the start frame)
+component = np.array(list(defect_dict.keys()), dtype=np.int64)
+rows = [np.asarray(defect_dict[c], dtype=np.int64) for c in component]
+atom_component = np.repeat(component, [len(r) for r in rows])
+start_rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
 
+data_path = op.join(args.path, 'graphs')
+all_frames = sorted([f.replace('.npz', '') for f in os.listdir(data_path) if f.endswith('.npz')],
+                    key=frame_sort_key)
 
-for c in component:
-    df_all=pd.DataFrame()
+# Neighbor counts of every tracked atom in every frame (-1 if absent); atoms
+# are matched by identifier through each frame's atom index, so that the atom
+# order may differ between dumps. Only the n_neighbors column is read here
+frames = all_frames[args.start:]
+atom_ids = None
+frame_rows, n_neighbors = [], []
+for frame in frames:
+    table_path = find_atom_table(args.path, frame)
+    if atom_ids is None:
+        atom_ids = read_atom_table(table_path, columns=['idx'])['idx'].values[start_rows]
+    rows_in_frame = atom_rows(load_atom_index(args.path, frame), atom_ids)
+    present = rows_in_frame >= 0
+    counts = np.full(len(atom_ids), -1, dtype=np.int64)
+    frame_counts = read_atom_table(table_path, columns=['n_neighbors'])['n_neighbors'].values
+    counts[present] = frame_counts[rows_in_frame[present]]
+    frame_rows.append(rows_in_frame)
+    n_neighbors.append(counts)
+    logging.info(f'... gathered {present.sum()} tracked atoms from {frame}')
 
-    data_path = op.join(args.path, 'graphs')
-    all_frames=sorted([f for f in os.listdir(data_path) if f.endswith('.npz')])
+# check if any neighbor counts in each defect changed, for all components at once
+n_neighbors = np.array(n_neighbors)
+changed_atoms = (n_neighbors.max(axis=0) != n_neighbors.min(axis=0)) if len(n_neighbors) else np.zeros(0, bool)
+changed_components = np.unique(atom_component[changed_atoms])
+logging.info(f'{len(changed_components)} of {len(component)} defects changed neighbors')
 
-    for structure in sorted([int(x.split('.')[n]) for x in all_frames]):
-        # load dataframe from next time step
-        df=pd.read_csv(op.join(data_path, 'csvs', f'dump.{structure}.txt.csv'))
-        df['norm_distances'] = df['summed_neighbor_distances']/df['n_neighbors']
-        df['step']=structure
-
-        # merge with full dataframe    
-        df_all=pd.concat([df_all, df.iloc[vacancy_dict[c]]])
-
-    # check if any neighbor counts in the vacancy changed
-    atoms = df_all.loc[(df_all.step==0)].idx.tolist()
-    changed_atoms=[int(atom) for atom in atoms if df_all.loc[df_all.idx==atom].n_neighbors.std()>0]
-
-    if len(changed_atoms)>0:
-        df_all.to_csv(op.join(args.path,'defects', f'defect_info_{args.n_nodes}nodes_{args.n_edges}edges_component{c}.csv'), index=False)
+# Gather the histories of the changed defects only, and write them as one table
+if len(changed_components) > 0:
+    columns = args.columns
+    if columns is not None:
+        columns = list(dict.fromkeys(['idx', 'n_neighbors', 'summed_neighbor_distances'] + columns))
+    changed = np.isin(atom_component, changed_components)
+    histories = []
+    for i, (frame, rows_in_frame) in enumerate(zip(frames, frame_rows)):
+        keep = changed & (rows_in_frame >= 0)
+        df = read_atom_table(find_atom_table(args.path, frame), columns=columns)
+        step = re.search(r'\d+', frame)
+        history = df.iloc[rows_in_frame[keep]].reset_index(drop=True)
+        history['norm_distances'] = history['summed_neighbor_distances']/history['n_neighbors']
+        history.insert(0, 'step', int(step.group()) if step else args.start + i)
+        history.insert(0, 'component', atom_component[keep])
+        histories.append(history)
+    df_all = pd.concat(histories, ignore_index=True)
+    df_all.to_csv(op.join(args.path, 'defects', f'defect_info_{args.n_nodes}nodes_{args.n_edges}edges_startat{args.start}.csv'), index=False)
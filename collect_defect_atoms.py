@@ -26,6 +26,8 @@ import os.path as op
 import pickle
 import logging
 import argparse
+from galas_io import frame_sort_key
+from defect_types import SIGNATURES, load_signatures, classify_components
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--path', type=str, default='./data/', 
@@ -36,16 +38,27 @@ parser.add_argument('--n_nodes', type=int, default=12,
                     help='Number of nodes ideal defect')
 parser.add_argument('--n_edges', type=int, default=24,
                     help='Number of edges in ideal defect')
+parser.add_argument('--type', type=str, default=None,
+                    help='Defect type to collect by name (e.g. Di-vacancy) instead of --n_nodes/--n_edges')
+parser.add_argument('--lattice', type=str, default='FCC', choices=list(SIGNATURES),
+                    help='Lattice whose defect signatures define --type')
+parser.add_argument('--signatures', type=str, default=None,
+                    help='JSON file of defect signatures {type: [nodes, edges]} replacing the built-in ones')
 args = parser.parse_args()
 
+# A defect type stands for its (nodes, edges) signature, which names the output
+signatures = load_signatures(args.lattice, args.signatures)
+if args.type is not None:
+    if args.type not in signatures or signatures[args.type][1] is None:
+        parser.error(f'--type must be one of the {args.lattice} types with a fixed edge count: '
+                     + ', '.join(name for name, (_, edges) in signatures.items() if edges is not None))
+    args.n_nodes, args.n_edges = signatures[args.type]
+
 if not op.isdir(op.join(args.path, 'defects')):
     os.mkdir(op.join(args.path, 'defects'))
 
 data_path = op.join(args.path, 'graphs')
-all_frames=sorted([f for f in os.listdir(data_path) if f.endswith('.npz')])
-
-# load dataframe from t0
-df=pd.read_csv(op.join(data_path, 'csvs', all_frames[args.start].replace('.npz','.csv')))
+all_frames=sorted([f for f in os.listdir(data_path) if f.endswith('.npz')], key=frame_sort_key)
 
 # load component metadata (defect indices and sorted labels)
 meta = np.load(op.join(args.path, 'components', all_frames[args.start].replace('.npz', '.meta.npz')))
@@ -62,8 +75,13 @@ for comp_id in range(n_comp):
 # gather component info
 info = pd.read_csv(op.join(args.path, 'components', 'csvs', all_frames[args.start].replace('.npz','.csv')))
 
-# get all single vacancies
-defect_index = info.loc[(info.Nodes==args.n_nodes)&(info.Edges==args.n_edges)].Component.tolist()
+# get all defects of the type (by its Type column, classified here for older
+# component tables), or of the given signature
+if args.type is not None:
+    types = info['Type'] if 'Type' in info else classify_components(info, signatures)
+    defect_index = info.loc[types == args.type].Component.tolist()
+else:
+    defect_index = info.loc[(info.Nodes==args.n_nodes)&(info.Edges==args.n_edges)].Component.tolist()
 
 defect_dict={}
 for d_index in defect_index:
@@ -22,101 +22,591 @@
 import os
 import os.path as op
 import gzip
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 from ovito.io import import_file
-from ovito.data import CutoffNeighborFinder
+from ovito.data import CutoffNeighborFinder, DataCollection
 from ovito.modifiers import PolyhedralTemplateMatchingModifier, VoronoiAnalysisModifier
 import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
 import logging
 import argparse
+from galas_io import (atomic_output, NeighborWriter, neighbors_to_csr, stitch_neighbors,
+                      save_graph, graph_degrees, atom_table_path, write_atom_table,
+                      write_atom_index, write_cell, parse_frame_slice, frame_sort_key, Manifest,
+                      dump_frame_ranges)
+from defect_types import CUTOFF_SHELLS, IDEAL_NEIGHBORS
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--path', type=str, default='./data/', 
                     help='Path to data folder')
 parser.add_argument('--lattice_constant', type=float, default=4.0559, 
                     help='Ideal lattice constant -- default for FCC Al at 300 K')
-args = parser.parse_args()
+parser.add_argument('--lattice', type=str, default='FCC', choices=list(IDEAL_NEIGHBORS),
+                    help='Lattice whose neighbor shells set the cutoff and the ideal number of neighbors')
+parser.add_argument('--ideal_neighbors', type=int, default=None,
+                    help='Ideal number of neighbors within the cutoff (default: 12 for FCC and HCP, 14 for BCC)')
+parser.add_argument('--voronoi', type=str, default='all', choices=['all', 'defects', 'none'],
+                    help='Atomic volumes for all atoms, only defect atoms and a one-shell halo, or none')
+parser.add_argument('--trajectory', type=str, default=None,
+                    help='Multi-frame dump or wildcard sequence (e.g. dump.*.txt) in dumps/ to stream through one pipeline')
+parser.add_argument('--frames', type=str, default=':',
+                    help='Frame selection start:stop:step for --trajectory')
+parser.add_argument('--chunk_size', type=int, default=1000000,
+                    help='Number of central atoms per neighbor query (0 = whole frame at once)')
+parser.add_argument('--neighbor_format', type=str, default='bin', choices=['bin', 'txt'],
+                    help='Neighbor file format: binary (memory-mappable) or gzipped text export')
+parser.add_argument('--fused', action='store_true',
+                    help='Build graphs/<frame>.npz and neighbor columns directly, without a neighbor file')
+parser.add_argument('--table_format', type=str, default='parquet', choices=['parquet', 'feather', 'csv'],
+                    help='Storage format of the per-atom tables')
+parser.add_argument('--max_tile_atoms', type=int, default=0,
+                    help='Split frames into spatial tiles owning at most this many atoms each, bounding the '
+                         'PTM, Voronoi and neighbor search working set; the frame and per-atom arrays are '
+                         'still held in full (0 = no tiling)')
+parser.add_argument('--workers', type=int, default=1,
+                    help='Number of frames processed concurrently in a process pool')
+parser.add_argument('--overwrite', action='store_true',
+                    help='Recompute frames that the manifest records as up to date')
 
-# Set up file structure
-# NOTE: code assumes dumps folder already present and populated
-if not op.isdir(op.join(args.path, 'neighbors')):
-    os.mkdir(op.join(args.path, 'neighbors'))
-    
-if not op.isdir(op.join(args.path, 'graphs')):
-    os.mkdir(op.join(args.path, 'graphs'))
+# ------------------------------------------------------------------
+# Helper functions
+# ------------------------------------------------------------------
 
-if not op.isdir(op.join(args.path, 'graphs/csvs')):
-    os.mkdir(op.join(args.path, 'graphs/csvs'))
-    
-if not op.isdir(op.join(args.path, 'components')):
-    os.mkdir(op.join(args.path, 'components'))
+def iter_neighbor_chunks(finder, indices, chunk_size, counts=None):
+    """Yield neighbor pairs of the central atoms *indices* (ascending; an array
+    or a range) as typed arrays (int32 src/dst, float32 distance), querying a
+    fixed-size block of central atoms at a time. If given, the per-atom
+    neighbor *counts* are accumulated along the way."""
+    if chunk_size <= 0:
+        chunk_size = max(len(indices), 1)
+    for start in range(0, len(indices), chunk_size):
+        central = np.asarray(indices[start:start + chunk_size])
+        neigh_idx, neigh_vec = finder.find_all(central, sort_by='index')
+        src = neigh_idx[:, 0].astype(np.int32)
+        dst = neigh_idx[:, 1].astype(np.int32)
+        dist = np.linalg.norm(neigh_vec, axis=1).astype(np.float32)
+        del neigh_idx, neigh_vec
+        if counts is not None:
+            counts[central] += (np.searchsorted(src, central, side='right')
+                                - np.searchsorted(src, central, side='left'))
+        yield src, dst, dist
+
+
+def voronoi_modifier(**kwargs):
+    """Voronoi analysis modifier used to compute atomic volumes."""
+    return VoronoiAnalysisModifier(
+        compute_indices = True,
+        use_radii = True,
+        edge_threshold = 0.1,
+        **kwargs
+    )
+
+
+def neighbor_shell(finder, mask):
+    """Grow a particle mask by one shell of cutoff neighbors."""
+    neigh_idx, _ = finder.find_all(np.flatnonzero(mask))
+    grown = mask.copy()
+    grown[neigh_idx[:, 1]] = True
+    return grown
+
+
+def defect_voronoi_volumes(data, finder, n_neighbors, ideal_neighbors, lattice='FCC'):
+    """Voronoi volumes of defect atoms (non-ideal coordination or a PTM type
+    other than the lattice's) and a one-shell halo around them; NaN for all
+    other atoms.
+
+    The tessellation only sees the selected atoms, so it is run on one more
+    shell than is reported to keep the reported cells complete.
+    """
+    structure_type = np.asarray(data.particles['Structure Type'])
+    ideal_type = getattr(PolyhedralTemplateMatchingModifier.Type, lattice.upper())
+    defect = (n_neighbors != ideal_neighbors) | (structure_type != ideal_type)
+    reported = neighbor_shell(finder, defect)
+    tessellated = neighbor_shell(finder, reported)
+
+    data = data.clone()
+    data.particles_.create_property('Selection', data=tessellated.astype(np.int32))
+    data.apply(voronoi_modifier(only_selected=True))
+
+    volumes = np.full(data.particles.count, np.nan, dtype=np.float32)
+    volumes[reported] = np.asarray(data.particles['Atomic Volume'])[reported]
+    logging.info(f'... Voronoi volumes computed for {reported.sum()} defect and halo atoms')
+    return volumes
+
+
+def tile_grid(widths, n_particles, max_tile_atoms):
+    """Number of tiles along each cell vector such that, at uniform density,
+    no tile owns more than max_tile_atoms atoms. Tiles stay close to cubic."""
+    n_tiles = int(np.ceil(n_particles / max_tile_atoms))
+    grid = np.ones(3, dtype=int)
+    while grid.prod() < n_tiles:
+        grid[np.argmax(widths / grid)] += 1
+    return grid
+
+
+def iter_tiles(data, halo, max_tile_atoms):
+    """Split the (possibly triclinic) simulation cell into a grid of sub-boxes.
+
+    Yields, for each tile, the global indices of the atoms in the tile and in
+    its ghost layer of width *halo* (ascending), and a mask over those atoms
+    marking the ones the tile owns. Every atom is owned by exactly one tile.
+    Atoms are binned into tiles once, so the work per tile scales with the
+    size of the tile rather than of the frame.
+    """
+    cell = np.asarray(data.cell[...])
+    H, origin = cell[:, :3], cell[:, 3]
+    pbc = np.asarray(data.cell.pbc)
+    volume = abs(np.linalg.det(H))
+    widths = np.array([volume / np.linalg.norm(np.cross(H[:, (i + 1) % 3], H[:, (i + 2) % 3]))
+                       for i in range(3)])
+
+    # Tiles are boxes in reduced coordinates; the ghost width is converted
+    # with the distance between opposite cell faces
+    reduced = (np.asarray(data.particles['Position']) - origin) @ np.linalg.inv(H).T
+    reduced[:, pbc] %= 1.0
+    grid = tile_grid(widths, data.particles.count, max_tile_atoms)
+    ghost = halo / widths
+    logging.info(f'... {grid.prod()} tiles ({grid[0]} x {grid[1]} x {grid[2]})')
+
+    # Along each cell vector, in units of tiles, an atom at u is owned by
+    # tile floor(u) and is in the ghost layer of tiles k with
+    # u - 1 - ghost < k <= u + ghost (wrapped if periodic; the outer tiles of
+    # a non-periodic direction extend to infinity)
+    n_particles = data.particles.count
+    owner = np.zeros(n_particles, dtype=np.int64)
+    members = np.arange(n_particles, dtype=np.int64)
+    tiles = np.zeros(n_particles, dtype=np.int64)
+    for dim in range(3):
+        n_tiles, u, width = grid[dim], reduced[:, dim] * grid[dim], ghost[dim] * grid[dim]
+        owner = owner * n_tiles + np.clip(np.floor(u), 0, n_tiles - 1).astype(np.int64)
+        first = np.floor(u - 1 - width).astype(np.int64) + 1
+        last = np.floor(u + width).astype(np.int64)
+        if pbc[dim] and 1 + 2 * width >= n_tiles:
+            first, last = np.zeros(n_particles, dtype=np.int64), np.full(n_particles, n_tiles - 1)
+        elif not pbc[dim]:
+            first, last = np.clip(first, 0, n_tiles - 1), np.clip(last, 0, n_tiles - 1)
+
+        # One (tile, atom) membership per tile of the range
+        count = (last - first + 1)[members]
+        repeat = np.repeat(np.arange(len(members)), count)
+        offset = np.arange(len(repeat)) - np.repeat(np.cumsum(count) - count, count)
+        members = members[repeat]
+        tiles = tiles[repeat] * n_tiles + (first[members] + offset) % n_tiles
+        del repeat, offset
+
+    # Group the memberships by tile, atoms ascending within each tile
+    keys = tiles * n_particles + members
+    del tiles, members
+    keys.sort()
+    bounds = np.searchsorted(keys, np.arange(grid.prod() + 1) * n_particles)
+    for tile in range(grid.prod()):
+        tile_ids = keys[bounds[tile]:bounds[tile + 1]] - tile * n_particles
+        yield tile_ids, owner[tile_ids] == tile
+
+
+def tile_halo(cutoff, voronoi):
+    """Width of the ghost layer of the tiles, in cutoffs: one for the neighbor
+    lists and PTM of the owned atoms. A Voronoi cell depends on atoms up to
+    twice its circumradius, beyond one cutoff next to vacancies and voids, so
+    Voronoi for all atoms takes two; around defects, the defect atoms and the
+    two shells grown from them take one more."""
+    return cutoff * {'none': 1, 'all': 2, 'defects': 3}[voronoi]
+
+
+def cut_tile(data, ids):
+    """Data collection of the given particles of a frame (all their
+    properties, with their types) in the frame's cell."""
+    tile_data = DataCollection()
+    tile_data.objects.append(data.cell)
+    particles = tile_data.create_particles(count=len(ids))
+    for name in data.particles.keys():
+        prop = data.particles[name]
+        tile_prop = particles.create_property(name, data=np.asarray(prop)[ids])
+        for element_type in prop.types:
+            tile_prop.types.append(element_type)
+    return tile_data
+
+
+def collect_tiles(data, cutoff, neighbor_file, args):
+    """Collect neighbors, coordination and structure types tile by tile.
+
+    Each tile (owned atoms plus a ghost layer of tile_halo) is cut out of
+    the frame and runs its own PTM, Voronoi and neighbor search, so the
+    working set of the expensive steps scales with args.max_tile_atoms.
+    The frame itself, the per-atom results and the tile memberships (one per
+    atom and tile whose ghost layer it is in) still grow with the frame, so
+    peak memory is bounded by tiling only where those steps dominate it.
+    The ghost layer is wide enough for the owned atoms to get the same
+    neighbors, structure types and volumes as without tiling.
+    The periodic cell is kept, so pairs across boundaries use minimum images.
+    Pairs of owned atoms are spooled per tile and stitched into one neighbor
+    file sorted by src. Returns the per-atom structure types, atomic volumes
+    and neighbor counts.
+    """
+    n_particles = data.particles.count
+    structure_type = np.zeros(n_particles, dtype=np.int8)
+    atomic_volume = np.full(n_particles, np.nan, dtype=np.float32)
+    n_neighbors = np.zeros(n_particles, dtype=np.int32)
+
+    spool_dir = tempfile.mkdtemp(dir=op.dirname(op.abspath(neighbor_file)))
+    try:
+        spools = []
+        for tile_ids, owned in iter_tiles(data, tile_halo(cutoff, args.voronoi), args.max_tile_atoms):
+            # Cut the tile and its ghost layer out of the frame
+            tile_data = cut_tile(data, tile_ids)
+            tile_data.apply(PolyhedralTemplateMatchingModifier())
+            if args.voronoi == 'all':
+                tile_data.apply(voronoi_modifier())
+
+            # Pairs of owned atoms, translated to global indices
+            finder = CutoffNeighborFinder(cutoff, tile_data)
+            owned_local = np.flatnonzero(owned)
+            tile_counts = np.zeros(len(tile_ids), dtype=np.int32)
+            spool = op.join(spool_dir, f'tile{len(spools)}.neighbors.bin')
+            with NeighborWriter(spool, n_particles) as writer:
+                for src, dst, dist in iter_neighbor_chunks(finder, owned_local, args.chunk_size, tile_counts):
+                    writer.write(tile_ids[src], tile_ids[dst], dist)
+            spools.append(spool)
+
+            owned_ids = tile_ids[owned_local]
+            n_neighbors[owned_ids] = tile_counts[owned_local]
+            structure_type[owned_ids] = np.asarray(tile_data.particles['Structure Type'])[owned_local]
+            if args.voronoi == 'all':
+                atomic_volume[owned_ids] = np.asarray(tile_data.particles['Atomic Volume'])[owned_local]
+            elif args.voronoi == 'defects':
+                # Atoms within two cutoffs of the owned ones have complete neighbor
+                # lists; the outer ghost atoms may only be flagged by PTM
+                complete = np.flatnonzero(neighbor_shell(finder, neighbor_shell(finder, owned)))
+                neigh_idx, _ = finder.find_all(complete)
+                counts = np.full(len(tile_ids), args.ideal_neighbors, dtype=np.int32)
+                counts[complete] = np.bincount(neigh_idx[:, 0], minlength=len(tile_ids))[complete]
+                del neigh_idx
+                volumes = defect_voronoi_volumes(tile_data, finder, counts, args.ideal_neighbors, args.lattice)
+                atomic_volume[owned_ids] = volumes[owned_local]
+            del tile_data, finder
+
+        stitch_neighbors(neighbor_file, spools, n_neighbors)
+    finally:
+        shutil.rmtree(spool_dir)
+    return structure_type, atomic_volume, n_neighbors
+
+
+def chunks_to_csr(chunks, n_particles):
+    """Assemble the half-symmetric (upper-triangle) CSR graph directly from
+    neighbor chunks sorted by src, without an intermediate COO matrix."""
+    counts = np.zeros(n_particles, dtype=np.int64)
+    indices, weights = [np.empty(0, dtype=np.int32)], [np.empty(0, dtype=np.float32)]
+    for src, dst, dist in chunks:
+        upper = src < dst
+        counts += np.bincount(src[upper], minlength=n_particles)
+        indices.append(dst[upper])
+        weights.append(dist[upper])
+    n_pairs = int(counts.sum())
+    indptr = np.zeros(n_particles + 1, dtype=np.int32 if n_pairs < np.iinfo(np.int32).max else np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return csr_matrix((np.concatenate(weights), np.concatenate(indices), indptr),
+                      shape=(n_particles, n_particles), copy=False)
+
+
+def frame_outputs(load_file, args):
+    """Return the neighbor (or, when fused, graph) file and the per-atom
+    table written for one LAMMPS dump."""
+    if args.fused:
+        neighbor_file = op.join(args.path, 'graphs', load_file + '.npz')
+    else:
+        extension = '.neighbors.bin' if args.neighbor_format == 'bin' else '.neighbors.txt.gz'
+        neighbor_file = op.join(args.path, 'neighbors', load_file + extension)
+    table_file = atom_table_path(args.path, load_file, args.table_format)
+    return neighbor_file, table_file
+
+
+def neighbor_cutoff(lattice_constant, lattice='FCC'):
+    """Neighbor cutoff halfway between the neighbor shells of the lattice that
+    bracket it: the first and second for FCC and HCP, the second and third for
+    BCC, so that the defect signatures of defect_types apply."""
+    inner, outer = CUTOFF_SHELLS[lattice.upper()]
+    return (outer*lattice_constant + inner*lattice_constant)/2
+
+
+def stage_params(args):
+    """Parameters recorded in the manifest; changing any of them makes
+    every frame stale."""
+    return {'lattice_constant': args.lattice_constant,
+            'cutoff': neighbor_cutoff(args.lattice_constant, args.lattice),
+            'ideal_neighbors': args.ideal_neighbors,
+            'voronoi': args.voronoi,
+            'neighbor_format': args.neighbor_format,
+            'fused': args.fused,
+            'table_format': args.table_format}
+
+
+def record_frames(manifest, collected, args):
+    """Record collected (frame, source) pairs in the manifest."""
+    for load_file, source in collected:
+        manifest.record(load_file, 'collect_neighbors', [source], stage_params(args),
+                        frame_outputs(load_file, args))
+
+
+def build_pipeline(source, voronoi='all', tiled=False):
+    """Set up the Ovito pipeline (PTM and, for all atoms, Voronoi) for a
+    dump file or trajectory. Tiled collection applies the modifiers per
+    tile, so its pipeline only reads the frame."""
+    pipeline = import_file(source)
+    if tiled:
+        return pipeline
+    pipeline.modifiers.append(PolyhedralTemplateMatchingModifier())
     
-if not op.isdir(op.join(args.path, 'components/csvs')):
-    os.mkdir(op.join(args.path, 'components/csvs'))
+    # Set up the Voronoi analysis modifier to compute atomic volumes
+    if voronoi == 'all':
+        pipeline.modifiers.append(voronoi_modifier())
+    return pipeline
 
-# Collect all LAMMPS dumps
-data_path = op.join(args.path, 'dumps')
-all_frames = [f for f in os.listdir(data_path)]
-logging.info(f'{len(all_frames)} to total frames in {data_path}')
 
-# Read through LAMMPS files and collect neighbors
-for load_file in all_frames:
-    # Define file names
-    neighbor_file = op.join('neighbors', load_file + '.neighbors.txt.gz')
-    csv_file = op.join('graphs/csvs', load_file + '.csv')
+def trajectory_frame_name(attributes, multi_frame_file):
+    """Name a trajectory frame like a single dump: the source file name for
+    wildcard sequences, dump.<timestep>.txt for multi-frame files."""
+    if multi_frame_file:
+        return f"dump.{attributes.get('Timestep', attributes['SourceFrame'])}.txt"
+    return op.basename(attributes['SourceFile'])
+
+
+def collect_frame(load_file, args):
+    """Collect neighbor pairs and per-atom data for one LAMMPS dump.
+    Returns the collected (dump name, dump file) pair in a list, which is
+    empty if Ovito could not read the dump."""
+    source = op.join(args.path, 'dumps', load_file)
 
     # Read in LAMMPS dump
     logging.info(f'Collecing neighbors from {load_file}')
     try:
-        pipeline = import_file(op.join(data_path, load_file))
-        pipeline.modifiers.append(PolyhedralTemplateMatchingModifier())
-        
-        # Set up the Voronoi analysis modifier to compute atomic volumes
-        voro = VoronoiAnalysisModifier(
-            compute_indices = True,
-            use_radii = True,
-            edge_threshold = 0.1
-        )
-        pipeline.modifiers.append(voro)
-        
+        pipeline = build_pipeline(source, args.voronoi, args.max_tile_atoms > 0)
         data = pipeline.compute()
     except:
-        logging.warning(f'... file could not be read by Ovito')
-        continue
+        logging.warning(f'... {load_file} could not be read by Ovito')
+        return []
 
-    # Determine neighbor cutoff based on unit cell
-    # NOTE: cutoff equation for FCC only!
-    cutoff = np.sqrt(2)*args.lattice_constant/2 
-    cutoff = (args.lattice_constant+cutoff)/2
-    logging.info(f'... cutoff for neighbor distances is {cutoff:0.3f} A')
+    return [(load_file, source)] if collect_data(data, load_file, args) else []
+
+
+def collect_trajectory(frames, args, manifest, pipeline=None, ranges=None):
+    """Stream the given frames of args.trajectory through a single pipeline,
+    so that file parsing setup and modifier construction are paid once.
+    Frames the manifest records as up to date are skipped. With the byte
+    *ranges* of the frames of a multi-frame dump, each frame's source is its
+    own range of the file, so appending timesteps leaves earlier frames up to
+    date. Returns the (frame name, source) pairs of the frames that were
+    collected."""
+    if pipeline is None:
+        pipeline = build_pipeline(op.join(args.path, 'dumps', args.trajectory),
+                                  args.voronoi, args.max_tile_atoms > 0)
+    multi_frame_file = '*' not in args.trajectory
 
+    collected = []
+    for frame in frames:
+        # Loading the frame alone is enough to name it and check for outputs
+        try:
+            attributes = pipeline.source.compute(frame).attributes
+        except:
+            logging.warning(f'... frame {frame} could not be read by Ovito')
+            continue
+        load_file = trajectory_frame_name(attributes, multi_frame_file)
+        source = attributes['SourceFile']
+        if ranges is not None:
+            source = (source, *ranges[frame])
+        if not args.overwrite and manifest.is_fresh(load_file, 'collect_neighbors', [source], stage_params(args)):
+            continue
+
+        logging.info(f'Collecing neighbors from frame {frame} ({load_file})')
+        try:
+            data = pipeline.compute(frame)
+        except:
+            logging.warning(f'... frame {frame} could not be computed by Ovito')
+            continue
+        if collect_data(data, load_file, args):
+            collected.append((load_file, source))
+    return collected
+
+
+def collect_untiled(data, cutoff, neighbor_file, args):
+    """Collect neighbors of the whole frame and write the neighbor file
+    (or, when fused, the graph). Returns the per-atom structure types, atomic
+    volumes and neighbor counts, and the graph if one was built."""
     # Initialize neighbor finder object
     finder = CutoffNeighborFinder(cutoff, data)
 
-    # Find neighbors and accumulate into arrays
-    row, col, dist = [], [], []
-    for index in range(data.particles.count):
-        for neigh in finder.find(index):
-            row.append(index)
-            col.append(neigh.index)
-            dist.append(neigh.distance)
-
-    # Bulk-write neighbor pairs to file
-    edges = np.column_stack((row, col, dist))
-    with gzip.open(op.join(args.path, neighbor_file), "wb") as f:
-        np.savetxt(f, edges, fmt='%d %d %.6f')
-    logging.info(f'... neighbor pairs written as {neighbor_file}') 
-
-    # Collect coordinate data for graph/csvs  
+    # Find neighbors block by block and stream each block to file,
+    # so memory is bounded by the chunk size rather than the frame size
+    n_pairs = 0
+    n_neighbors = np.zeros(data.particles.count, dtype=np.int32)
+    chunks = iter_neighbor_chunks(finder, range(data.particles.count), args.chunk_size, n_neighbors)
+    A_csr = None
+    with atomic_output(neighbor_file) as tmp_file:
+        if args.fused:
+            # Build the graph in memory and skip the neighbor file round trip
+            A_csr = chunks_to_csr(chunks, data.particles.count)
+            save_graph(tmp_file, A_csr)
+            n_pairs = 2*A_csr.nnz
+        elif args.neighbor_format == 'bin':
+            with NeighborWriter(tmp_file, data.particles.count) as writer:
+                for src, dst, dist in chunks:
+                    writer.write(src, dst, dist)
+            n_pairs = writer.n_pairs
+        else:
+            with gzip.open(tmp_file, "wb") as f:
+                for src, dst, dist in chunks:
+                    np.savetxt(f, np.column_stack((src, dst, dist)), fmt='%d %d %.6f')
+                    n_pairs += len(src)
+    logging.info(f'... {n_pairs} neighbor pairs written as {neighbor_file}') 
+
+    atomic_volume = atomic_volumes(data, finder, n_neighbors, args)
+    return np.asarray(data.particles['Structure Type']), atomic_volume, n_neighbors, A_csr
+
+
+def atomic_volumes(data, finder, n_neighbors, args):
+    """Atomic volumes of an untiled frame, possibly only around defects (NaN elsewhere)."""
+    if args.voronoi == 'all':
+        return np.asarray(data.particles['Atomic Volume'])
+    elif args.voronoi == 'defects':
+        return defect_voronoi_volumes(data, finder, n_neighbors, args.ideal_neighbors, args.lattice)
+    return np.full(data.particles.count, np.nan, dtype=np.float32)
+
+
+def atom_table(data, structure_type, atomic_volume, n_neighbors=None, A_csr=None):
+    """Per-atom table of a computed frame, with the neighbor columns
+    (normally added by make_graphs.py) if the graph is given."""
+    # Collect coordinate data for the per-atom table
     pos = np.asarray(data.particles['Position'])
     d={'idx': np.asarray(data.particles['Particle Identifier']), 
        'atom_type': np.asarray(data.particles['Particle Type']),
-       'structure_type': np.asarray(data.particles['Structure Type']),
-       'atomic_volume': np.asarray(data.particles['Atomic Volume']),
+       'structure_type': structure_type,
+       'atomic_volume': atomic_volume,
        'x': pos[:, 0],
        'y': pos[:, 1],
        'z': pos[:, 2]}
     df = pd.DataFrame(d)
-    df.to_csv(op.join(args.path, csv_file), index=False)
-    logging.info(f'... coordinate data written to {csv_file}')
 
+    # Neighbor info normally added by make_graphs.py
+    if A_csr is not None:
+        df['n_neighbors'] = n_neighbors
+        df['summed_neighbor_distances'] = graph_degrees(A_csr)[1]
+        df['norm_distances'] = df['summed_neighbor_distances']/df['n_neighbors']
+    return df
+
+
+def collect_data(data, load_file, args):
+    """Collect neighbor pairs and per-atom data from a computed frame."""
+    # Define file names
+    neighbor_file, table_file = frame_outputs(load_file, args)
+
+    # Determine neighbor cutoff based on unit cell
+    cutoff = neighbor_cutoff(args.lattice_constant, args.lattice)
+    logging.info(f'... cutoff for neighbor distances is {cutoff:0.3f} A')
+
+    # Spatially tiled collection under a memory budget; in fused mode the
+    # stitched neighbor file only serves to build the graph
+    A_csr = None
+    if args.max_tile_atoms > 0:
+        with atomic_output(neighbor_file) as tmp_file:
+            if args.fused:
+                stitched_file = tmp_file.replace('.npz', '.neighbors.bin')
+                try:
+                    per_atom = collect_tiles(data, cutoff, stitched_file, args)
+                    A_csr = neighbors_to_csr(stitched_file)
+                    save_graph(tmp_file, A_csr)
+                finally:
+                    if op.exists(stitched_file):
+                        os.remove(stitched_file)
+            else:
+                per_atom = collect_tiles(data, cutoff, tmp_file, args)
+        structure_type, atomic_volume, n_neighbors = per_atom
+        logging.info(f'... {n_neighbors.sum()} neighbor pairs written as {neighbor_file}')
+    else:
+        structure_type, atomic_volume, n_neighbors, A_csr = collect_untiled(data, cutoff, neighbor_file, args)
+
+    df = atom_table(data, structure_type, atomic_volume, n_neighbors, A_csr)
+    write_atom_table(df, table_file)
+    write_atom_index(args.path, load_file, df['idx'].values)
+    write_cell(args.path, load_file, np.asarray(data.cell[...]), data.cell.pbc)
+    logging.info(f'... coordinate data written to {table_file}')
+    return load_file
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.ideal_neighbors is None:
+        args.ideal_neighbors = IDEAL_NEIGHBORS[args.lattice]
+    if args.max_tile_atoms > 0 and args.neighbor_format == 'txt' and not args.fused:
+        parser.error('tiled collection writes binary neighbor files; use --neighbor_format bin or --fused')
+
+    # Set up file structure
+    # NOTE: code assumes dumps folder already present and populated
+    if not op.isdir(op.join(args.path, 'neighbors')):
+        os.mkdir(op.join(args.path, 'neighbors'))
+        
+    if not op.isdir(op.join(args.path, 'graphs')):
+        os.mkdir(op.join(args.path, 'graphs'))
+
+    if not op.isdir(op.join(args.path, 'graphs/csvs')):
+        os.mkdir(op.join(args.path, 'graphs/csvs'))
+
+    if not op.isdir(op.join(args.path, 'graphs/tables')):
+        os.mkdir(op.join(args.path, 'graphs/tables'))
+        
+    if not op.isdir(op.join(args.path, 'components')):
+        os.mkdir(op.join(args.path, 'components'))
+        
+    if not op.isdir(op.join(args.path, 'components/csvs')):
+        os.mkdir(op.join(args.path, 'components/csvs'))
+
+    # Frames already processed with the same inputs and parameters are
+    # skipped (outputs are moved into place atomically and recorded only
+    # once complete, so an interrupted run resumes where it stopped)
+    manifest = Manifest(args.path)
+
+    # Stream a trajectory through one pipeline; in parallel, each worker
+    # streams a contiguous block of frames through its own pipeline
+    if args.trajectory:
+        pipeline = build_pipeline(op.join(args.path, 'dumps', args.trajectory),
+                                  args.voronoi, args.max_tile_atoms > 0)
+        frames = list(range(pipeline.source.num_frames))[parse_frame_slice(args.frames)]
+        logging.info(f'{len(frames)} frames selected from {args.trajectory}')
+
+        # Fingerprint the frames of a multi-frame dump by their own timesteps
+        ranges = None
+        if '*' not in args.trajectory:
+            ranges = dump_frame_ranges(op.join(args.path, 'dumps', args.trajectory))
+            if ranges is not None and len(ranges) != pipeline.source.num_frames:
+                ranges = None
+        tasks = [(collect_trajectory, block.tolist(), args, manifest, None, ranges)
+                 for block in np.array_split(frames, max(args.workers, 1)) if len(block)]
+        serial_tasks = [(collect_trajectory, [frame], args, manifest, pipeline, ranges) for frame in frames]
+
+    # Otherwise collect all LAMMPS dumps, one file per frame
+    else:
+        data_path = op.join(args.path, 'dumps')
+        all_frames = sorted(os.listdir(data_path), key=frame_sort_key)
+        logging.info(f'{len(all_frames)} to total frames in {data_path}')
+
+        if not args.overwrite:
+            todo = [f for f in all_frames
+                    if not manifest.is_fresh(f, 'collect_neighbors', [op.join(data_path, f)], stage_params(args))]
+            logging.info(f'... skipping {len(all_frames) - len(todo)} up-to-date frames')
+            all_frames = todo
+        tasks = serial_tasks = [(collect_frame, f, args) for f in all_frames]
+
+    # Read through LAMMPS files and collect neighbors; the manifest is only
+    # written here, as each task completes
+    if args.workers > 1:
+        # Spawn fresh interpreters so each worker gets its own Ovito state
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx) as pool:
+            futures = [pool.submit(*task) for task in tasks]
+            for future in as_completed(futures):
+                record_frames(manifest, future.result(), args)
+    else:
+        for func, *task_args in serial_tasks:
+            record_frames(manifest, func(*task_args), args)
@@ -21,22 +21,31 @@
 
 import os
 import os.path as op
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import numpy as np
 import pandas as pd
 import pickle
 import logging
 import argparse
-from scipy.spatial.distance import pdist, squareform
 from scipy.spatial import cKDTree
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from galas_io import (atomic_output, find_atom_table, read_atom_table, read_cell,
+                      parse_frame_slice, frame_sort_key)
+from defect_types import SIGNATURES, GBS, UNCLASSIFIED, load_signatures, classify_components
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--path', type=str, default='./data/',
                     help='Path to data folder')
 parser.add_argument('--lattice_constant', type=float, default=4.0559,
                     help='Lattice constant for normalizing distances')
+parser.add_argument('--lattice', type=str, default='FCC', choices=list(SIGNATURES),
+                    help='Lattice whose defect signatures classify components without a Type column')
+parser.add_argument('--signatures', type=str, default=None,
+                    help='JSON file of defect signatures {type: [nodes, edges]} replacing the built-in ones')
 parser.add_argument('--rdf_rmax', type=float, default=60.0,
                     help='Maximum radius for RDF computation (Angstrom)')
 parser.add_argument('--rdf_bins', type=int, default=300,
@@ -45,112 +54,204 @@ parser.add_argument('--sq_qmax', type=float, default=2.0,
                     help='Maximum q for structure factor (1/Angstrom)')
 parser.add_argument('--sq_nq', type=int, default=500,
                     help='Number of q points for structure factor')
+parser.add_argument('--sq_bin_width', type=float, default=0.01,
+                    help='Width of the pair distance bins for S(q) (Angstrom)')
+parser.add_argument('--sq_rmax', type=float, default=100.0,
+                    help='Pair distance cutoff for S(q), at most half the narrowest cell width (Angstrom); '
+                         'the cost grows with the number of pairs within it')
 parser.add_argument('--sro_shells', type=int, default=5,
                     help='Number of neighbor shells for Warren-Cowley parameters')
 parser.add_argument('--sro_shell_width', type=float, default=0.0,
                     help='Shell width in Angstrom (0 = auto from lattice constant)')
-args = parser.parse_args()
+parser.add_argument('--frames', type=str, default=None,
+                    help='Frame selection start:stop:step analyzed as a time series '
+                         '(default: report on the first frame only)')
+parser.add_argument('--workers', type=int, default=1,
+                    help='Number of frames analyzed in parallel')
 
 # ------------------------------------------------------------------
 # Helper functions
 # ------------------------------------------------------------------
 
-def compute_rdf(positions, rmax, nbins, box_volume):
-    """Compute radial distribution function for a set of point positions."""
+def periodic_images(positions, cell, pbc, rmax):
+    """Positions wrapped into the (possibly triclinic) simulation cell, followed
+    by every periodic image lying within rmax of the cell, and the index of the
+    original point of each. cell is Ovito's 3x4 matrix (cell vectors and origin)."""
+    H, origin = cell[:, :3], cell[:, 3]
+    reduced = (positions - origin) @ np.linalg.inv(H).T
+    reduced[:, pbc] %= 1.0
+
+    # Padding in reduced units: rmax over the distance between opposite faces
+    pad = np.where(pbc, rmax / cell_widths(cell), 0.0)
+    reach = np.ceil(pad).astype(int)
+
+    images, sources = [reduced], [np.arange(len(positions))]
+    for shift in np.stack(np.meshgrid(*[np.arange(-n, n + 1) for n in reach], indexing='ij'), -1).reshape(-1, 3):
+        if not shift.any():
+            continue
+        shifted = reduced + shift
+        near = np.all((shifted[:, pbc] >= -pad[pbc]) & (shifted[:, pbc] < 1.0 + pad[pbc]), axis=1)
+        images.append(shifted[near])
+        sources.append(np.flatnonzero(near))
+    return origin + np.concatenate(images) @ H.T, np.concatenate(sources)
+
+
+def iter_pair_distances(positions, cell, pbc, rmax, block_size=1 << 14):
+    """Yield blocks (i, j, d) of all ordered pairs of points within rmax of each
+    other under periodic boundaries, so every pair appears once per direction.
+    Pairs are enumerated from a KD-tree one block of points at a time, so memory
+    scales with the number of pairs in a block rather than with N^2."""
+    N = len(positions)
+    all_positions, sources = periodic_images(positions, cell, pbc, rmax)
+    tree = cKDTree(all_positions)
+    for start in range(0, N, block_size):
+        block = cKDTree(all_positions[start:min(start + block_size, N)])
+        pairs = block.sparse_distance_matrix(tree, rmax, output_type='ndarray')
+        i = pairs['i'] + start
+        keep = pairs['j'] != i  # the point itself, not one of its images
+        yield i[keep], sources[pairs['j'][keep]], pairs['v'][keep]
+
+
+def cell_volume(cell):
+    """Volume of the simulation cell."""
+    return abs(np.linalg.det(cell[:, :3]))
+
+
+def cell_widths(cell):
+    """Distances between the opposite faces of the simulation cell, along
+    each cell vector."""
+    H = cell[:, :3]
+    faces = np.linalg.norm(np.cross(H.T[[1, 2, 0]], H.T[[2, 0, 1]]), axis=1)
+    return cell_volume(cell) / faces
+
+
+def component_centroids(positions, defect_indices, labels, n_comp, cell, pbc):
+    """Centroid of every component, unwrapping each component's atoms to the
+    periodic image closest to its first atom."""
+    H = cell[:, :3]
+    _, first = np.unique(labels, return_index=True)
+    reference = np.zeros((n_comp, 3))
+    reference[labels[first]] = positions[defect_indices[first]]
+    offsets = (positions[defect_indices] - reference[labels]) @ np.linalg.inv(H).T
+    offsets[:, pbc] -= np.round(offsets[:, pbc])
+    offsets = offsets @ H.T
+    counts = np.bincount(labels, minlength=n_comp)
+    with np.errstate(invalid='ignore'):
+        mean_offsets = np.stack([np.bincount(labels, weights=offsets[:, k], minlength=n_comp)
+                                 for k in range(3)], axis=1) / counts[:, None]
+    return reference + mean_offsets, counts
+
+
+def compute_rdf(positions, rmax, nbins, cell, pbc):
+    """Compute radial distribution function for a set of point positions in a
+    periodic simulation cell."""
     N = len(positions)
     if N < 2:
         return np.zeros(nbins), np.linspace(0, rmax, nbins)
     
-    dists = pdist(positions)
-    density = N / box_volume
+    density = N / cell_volume(cell)
     
     bin_edges = np.linspace(0, rmax, nbins + 1)
     bin_centers = 0.5 * (bin_edges[:-1] + bin_edges[1:])
-    dr = bin_edges[1] - bin_edges[0]
     
-    hist, _ = np.histogram(dists, bins=bin_edges)
+    # Histogram the pairs block by block; each pair is enumerated twice
+    hist = np.zeros(nbins)
+    for _, _, dists in iter_pair_distances(positions, cell, pbc, rmax):
+        hist += np.histogram(dists, bins=bin_edges)[0]
+    hist /= 2
     
     # Normalize: g(r) = hist / (N * density * shell_volume)
     shell_volumes = (4.0 / 3.0) * np.pi * (bin_edges[1:]**3 - bin_edges[:-1]**3)
-    # Each pair counted once in pdist; total pairs = N*(N-1)/2
+    # Each pair counted once; total pairs = N*(N-1)/2
     # g(r) normalization: hist / (0.5 * N * density * shell_volume)
     gr = hist / (0.5 * N * density * shell_volumes)
     
     return gr, bin_centers
 
 
-def compute_cross_rdf(positions_a, positions_b, rmax, nbins, box_volume):
-    """Compute cross-RDF between two sets of positions (type A around type B)."""
-    Na = len(positions_a)
-    Nb = len(positions_b)
-    if Na == 0 or Nb == 0:
-        return np.zeros(nbins), np.linspace(0, rmax, nbins)
-    
-    # Compute all distances between A and B
-    tree_b = cKDTree(positions_b)
-    dists = []
-    for pos in positions_a:
-        d = tree_b.query_ball_point(pos, rmax, return_length=False)
-        for idx in d:
-            dist = np.linalg.norm(pos - positions_b[idx])
-            if dist > 1e-10:  # exclude self if same set
-                dists.append(dist)
-    dists = np.array(dists)
+def labeled_positions(centroids_by_type):
+    """Stack the centroids of all types, with the type index of each."""
+    all_positions = np.concatenate([np.reshape(c, (-1, 3)) for c in centroids_by_type])
+    all_types = np.repeat(np.arange(len(centroids_by_type)), [len(c) for c in centroids_by_type])
+    return all_positions, all_types
+
+
+def compute_partial_rdfs(centroids_by_type, rmax, nbins, cell, pbc):
+    """Compute the partial RDFs g_AB(r) (type B around type A) of every pair
+    of types from one enumeration of the labeled pairs within rmax."""
+    all_positions, all_types = labeled_positions(centroids_by_type)
+    n_types = len(centroids_by_type)
+    counts = np.bincount(all_types, minlength=n_types)
     
-    density_b = Nb / box_volume
     bin_edges = np.linspace(0, rmax, nbins + 1)
     bin_centers = 0.5 * (bin_edges[:-1] + bin_edges[1:])
+    dr = bin_edges[1] - bin_edges[0]
     
-    hist, _ = np.histogram(dists, bins=bin_edges)
-    shell_volumes = (4.0 / 3.0) * np.pi * (bin_edges[1:]**3 - bin_edges[:-1]**3)
+    # Histogram of the ordered pairs by (type A, type B, distance bin)
+    hist = np.zeros(n_types * n_types * nbins)
+    for i, j, d in iter_pair_distances(all_positions, cell, pbc, rmax):
+        bins = np.minimum((d / dr).astype(np.int64), nbins - 1)
+        key = (all_types[i] * n_types + all_types[j]) * nbins + bins
+        hist += np.bincount(key, minlength=len(hist))
+    hist = hist.reshape(n_types, n_types, nbins)
     
     # Normalize: g_AB(r) = hist / (Na * density_b * shell_volume)
-    gr = hist / (Na * density_b * shell_volumes + 1e-30)
+    shell_volumes = (4.0 / 3.0) * np.pi * (bin_edges[1:]**3 - bin_edges[:-1]**3)
+    density = counts / cell_volume(cell)
+    gr = hist / (counts[:, None, None] * density[None, :, None] * shell_volumes + 1e-30)
     
     return gr, bin_centers
 
 
-def compute_nn_distribution(positions, n_neighbors=1):
-    """Compute nearest-neighbor distance distribution."""
+def compute_nn_distribution(positions, cell, pbc, rmax, n_neighbors=1):
+    """Compute nearest-neighbor distance distribution under periodic boundaries
+    (images are considered up to rmax)."""
     if len(positions) < 2:
         return np.array([])
-    tree = cKDTree(positions)
+    all_positions, _ = periodic_images(positions, cell, pbc, rmax)
+    tree = cKDTree(all_positions)
     dists, _ = tree.query(positions, k=n_neighbors + 1)  # +1 for self
     nn_dists = dists[:, 1:]  # exclude self-distance (0)
     return nn_dists[:, 0]  # first nearest neighbor
 
 
-def compute_structure_factor(positions, qmax, nq):
-    """Compute radially-averaged structure factor S(q) via Debye formula."""
+def compute_structure_factor(positions, qmax, nq, cell, pbc, rmax, bin_width=0.01):
+    """Compute the radially-averaged structure factor of points in a periodic
+    cell from their pair distribution up to rmax (at most half the narrowest
+    cell width),
+
+        S(q) = 1 + 4 pi rho int r^2 (g(r) - 1) sin(qr)/(qr) W(r) dr,
+
+    where the Lorch window W(r) = sin(pi r/rmax)/(pi r/rmax) damps the ripples
+    of the truncation. Pairs are enumerated under periodic boundaries within
+    rmax only, so the cost grows with N rho rmax^3 rather than N^2."""
     N = len(positions)
-    if N < 2:
-        return np.zeros(nq), np.linspace(0.01, qmax, nq)
-    
     q_values = np.linspace(0.01, qmax, nq)
-    dists = pdist(positions)
-    
-    S_q = np.ones(nq)
-    for i, q in enumerate(q_values):
-        qr = q * dists
-        # Debye formula: S(q) = 1 + (2/N) * sum(sin(qr)/(qr))
-        sinc_term = np.where(qr > 1e-10, np.sin(qr) / qr, 1.0)
-        S_q[i] = 1.0 + (2.0 / N) * np.sum(sinc_term)
-    
+    if N < 2:
+        return np.zeros(nq), q_values
+    rmax = min(rmax, 0.5 * cell_widths(cell)[pbc].min()) if pbc.any() else rmax
+
+    # Neighbors per point in fine distance bins, less those of an ideal gas
+    nbins = int(np.ceil(rmax / bin_width))
+    bin_edges = np.arange(nbins + 1) * bin_width
+    r = 0.5 * (bin_edges[:-1] + bin_edges[1:])
+    hist = np.zeros(nbins)
+    for _, _, d in iter_pair_distances(positions, cell, pbc, rmax):
+        hist += np.bincount(np.minimum((d / bin_width).astype(np.int64), nbins - 1), minlength=nbins)
+    shell_volumes = (4.0 / 3.0) * np.pi * (bin_edges[1:]**3 - bin_edges[:-1]**3)
+    excess = hist / N - N / cell_volume(cell) * shell_volumes
+
+    # Windowed Fourier transform, one term per bin
+    # (np.sinc(x) is sin(pi x)/(pi x))
+    S_q = 1.0 + np.sinc(np.outer(q_values, r) / np.pi) @ (excess * np.sinc(r / rmax))
+
     return S_q, q_values
 
 
-def compute_warren_cowley(centroids_by_type, type_names, n_shells, shell_width):
+def compute_warren_cowley(centroids_by_type, type_names, n_shells, shell_width, cell, pbc):
     """Compute Warren-Cowley SRO parameters between defect types."""
     # Combine all centroids with type labels
-    all_positions = []
-    all_types = []
-    for t_idx, (name, positions) in enumerate(zip(type_names, centroids_by_type)):
-        for pos in positions:
-            all_positions.append(pos)
-            all_types.append(t_idx)
-    
-    all_positions = np.array(all_positions)
-    all_types = np.array(all_types)
+    all_positions, all_types = labeled_positions(centroids_by_type)
     N = len(all_positions)
     n_types = len(type_names)
     
@@ -158,51 +259,29 @@ def compute_warren_cowley(centroids_by_type, type_names, n_shells, shell_width):
         return np.zeros((n_shells, n_types, n_types)), np.zeros(n_shells)
     
     # Global concentrations
-    concentrations = np.array([np.sum(all_types == t) / N for t in range(n_types)])
-    
-    # Build KD-tree
-    tree = cKDTree(all_positions)
+    concentrations = np.bincount(all_types, minlength=n_types) / N
     
     # Define shell boundaries
     shell_boundaries = np.array([(n * shell_width, (n + 1) * shell_width) for n in range(n_shells)])
     shell_centers = 0.5 * (shell_boundaries[:, 0] + shell_boundaries[:, 1])
     
-    # Compute alpha for each shell and type pair
-    alpha = np.zeros((n_shells, n_types, n_types))
-    
-    for shell_idx in range(n_shells):
-        r_min, r_max = shell_boundaries[shell_idx]
-        
-        for i_type in range(n_types):
-            i_mask = all_types == i_type
-            i_indices = np.where(i_mask)[0]
-            Ni = len(i_indices)
-            if Ni == 0:
-                continue
-            
-            for j_type in range(n_types):
-                if concentrations[j_type] < 1e-10:
-                    continue
-                
-                # Count j-type neighbors in this shell for all i-type atoms
-                total_neighbors = 0
-                j_count = 0
-                
-                for idx in i_indices:
-                    neighbors_in_shell = tree.query_ball_point(
-                        all_positions[idx], r_max)
-                    for n_idx in neighbors_in_shell:
-                        if n_idx == idx:
-                            continue
-                        d = np.linalg.norm(all_positions[idx] - all_positions[n_idx])
-                        if d >= r_min and d < r_max:
-                            total_neighbors += 1
-                            if all_types[n_idx] == j_type:
-                                j_count += 1
-                
-                if total_neighbors > 0:
-                    p_ij = j_count / total_neighbors
-                    alpha[shell_idx, i_type, j_type] = 1.0 - p_ij / concentrations[j_type]
+    # Count the (shell, i_type, j_type) of every ordered pair within the outer
+    # shell, from one periodic pair enumeration
+    counts = np.zeros(n_shells * n_types * n_types, dtype=np.int64)
+    for i, j, d in iter_pair_distances(all_positions, cell, pbc, n_shells * shell_width):
+        shell = (d / shell_width).astype(np.int64)
+        inside = shell < n_shells
+        key = (shell[inside] * n_types + all_types[i[inside]]) * n_types + all_types[j[inside]]
+        counts += np.bincount(key, minlength=len(counts))
+    counts = counts.reshape(n_shells, n_types, n_types)
+    
+    # alpha = 1 - p_ij / c_j, with p_ij the fraction of j-type neighbors in the
+    # shell around i-type centers (0 where there are no neighbors)
+    total_neighbors = counts.sum(axis=2, keepdims=True)
+    valid = (total_neighbors > 0) & (concentrations >= 1e-10)[None, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_ij = counts / total_neighbors
+        alpha = np.where(valid, 1.0 - p_ij / concentrations[None, None, :], 0.0)
     
     return alpha, shell_centers
 
@@ -212,369 +291,485 @@ def hertz_distribution(r, density):
     return 4.0 * np.pi * density * r**2 * np.exp(-(4.0 / 3.0) * np.pi * density * r**3)
 
 
-# ------------------------------------------------------------------
-# Main analysis
-# ------------------------------------------------------------------
-
-# Load component info to identify defect types
-data_path = args.path
-components_csv_dir = op.join(data_path, 'components', 'csvs')
-graphs_csv_dir = op.join(data_path, 'graphs', 'csvs')
-
-# Find all component CSVs
-comp_csvs = sorted([f for f in os.listdir(components_csv_dir) if f.endswith('.csv')])
-if not comp_csvs:
-    logging.error('No component CSVs found')
-    raise SystemExit(1)
-
-# Use the first frame (or only frame)
-comp_csv = comp_csvs[0]
-frame_name = comp_csv
-
-logging.info(f'Analyzing defect ordering for frame: {frame_name}')
-
-# Load component info and graph CSV
-info = pd.read_csv(op.join(components_csv_dir, comp_csv))
-graph_csv_name = comp_csv  # same name in graphs/csvs/
-df = pd.read_csv(op.join(graphs_csv_dir, graph_csv_name))
-
-# Load defect metadata to get atom indices per component
-meta_files = [f for f in os.listdir(op.join(data_path, 'components')) if f.endswith('.meta.npz')]
-if not meta_files:
-    logging.error('No .meta.npz files found in components/')
-    raise SystemExit(1)
-
-meta = np.load(op.join(data_path, 'components', meta_files[0]))
-defect_indices = meta['defect_indices']
-labels = meta['labels']
-
-# Estimate box volume from coordinate ranges
-x_range = df['x'].max() - df['x'].min()
-y_range = df['y'].max() - df['y'].min()
-z_range = df['z'].max() - df['z'].min()
-box_volume = x_range * y_range * z_range
-
-# Define defect type signatures (FCC)
-defect_signatures = {
-    'Mono-vacancy': (12, 24),
-    'Di-vacancy': (18, 40),
-    'Tri-vacancy (linear)': (24, 60),
-    'Tri-vacancy (triangular)': (24, 54),
-}
-
-# Classify components and compute centroids
-defect_centroids = {}  # type_name -> list of centroid positions
-unclassified_centroids = []
-
-for _, row in info.iterrows():
-    comp_id = int(row['Component'])
-    n_nodes = int(row['Nodes'])
-    n_edges = int(row['Edges'])
-    
-    # Skip GBS (component 0, the largest)
-    if comp_id == 0:
-        continue
-    
-    # Get atom indices for this component
-    local_mask = labels == comp_id
-    original_indices = defect_indices[local_mask]
-    
-    if len(original_indices) == 0:
-        continue
-    
-    # Compute centroid
-    centroid = df.iloc[original_indices][['x', 'y', 'z']].mean().values
-    
-    # Classify
-    classified = False
-    for defect_name, (sig_nodes, sig_edges) in defect_signatures.items():
-        if n_nodes == sig_nodes and n_edges == sig_edges:
-            if defect_name not in defect_centroids:
-                defect_centroids[defect_name] = []
-            defect_centroids[defect_name].append(centroid)
-            classified = True
-            break
-    
-    if not classified:
-        unclassified_centroids.append(centroid)
-
-# Add unclassified as a category if present
-if unclassified_centroids:
-    defect_centroids['Unclassified'] = unclassified_centroids
-
-# Report defect counts
-print("=" * 70)
-print("DEFECT ORDERING ANALYSIS")
-print("=" * 70)
-print(f"\nFrame: {frame_name}")
-print(f"Box volume: {box_volume:.1f} Å³")
-print(f"\nDefect counts by type:")
-all_centroids = []
-for name, centroids in defect_centroids.items():
-    print(f"  {name}: {len(centroids)}")
-    all_centroids.extend(centroids)
-all_centroids = np.array(all_centroids)
-print(f"  Total (excl. GBS): {len(all_centroids)}")
-
-# Create output directory
-fig_dir = op.join(data_path, 'figures')
-os.makedirs(fig_dir, exist_ok=True)
-report_path = op.join(data_path, 'ordering_report.csv')
+def load_frame_centroids(data_path, frame, signatures):
+    """Compute the centroids of the components of a frame (a dump name) by
+    defect type. Returns the centroids of each type (the GBS excluded), and
+    the simulation cell and periodic flags of the frame."""
+    # Load component info and the atom positions of the per-atom table
+    info = pd.read_csv(op.join(data_path, 'components', 'csvs', frame + '.csv'))
+    df = read_atom_table(find_atom_table(data_path, frame), columns=['x', 'y', 'z'])
+
+    # Load defect metadata of the same frame to get atom indices per component
+    meta_path = op.join(data_path, 'components', frame + '.meta.npz')
+    if not op.isfile(meta_path):
+        raise FileNotFoundError(f'No .meta.npz file found in components/ for {frame}')
+
+    meta = np.load(meta_path)
+    defect_indices = meta['defect_indices']
+    labels = meta['labels']
+
+    # Simulation cell of the frame (from graphs/cells/ or the dump header); without
+    # one, fall back to the non-periodic bounding box of the atoms
+    cell = read_cell(data_path, frame)
+    if cell is None:
+        logging.warning('... no simulation cell found, using the non-periodic bounding box')
+        lower, upper = df[['x', 'y', 'z']].min().values, df[['x', 'y', 'z']].max().values
+        cell, pbc = np.column_stack([np.diag(upper - lower), lower]), np.zeros(3, dtype=bool)
+    else:
+        cell, pbc = cell
+
+    # Defect type of every component, as written by generate_components.py
+    # (classified here for component tables without a Type column)
+    if 'Type' not in info:
+        info['Type'] = classify_components(info, signatures)
+
+    # Compute centroids and group them by type, in order of first appearance
+    # with unclassified components last (the GBS is skipped)
+    positions_all = df[['x', 'y', 'z']].values.astype(np.float64)
+    centroids, comp_sizes = component_centroids(positions_all, defect_indices, labels,
+                                                len(info), cell, pbc)
+    comp_ids, types = info['Component'].values, info['Type'].values
+    keep = (types != GBS) & (comp_sizes[comp_ids] > 0)
+    comp_ids, types = comp_ids[keep], types[keep]
+    type_names = [name for name in pd.unique(types) if name != UNCLASSIFIED]
+    if UNCLASSIFIED in types:
+        type_names.append(UNCLASSIFIED)
+    defect_centroids = {name: list(centroids[comp_ids[types == name]]) for name in type_names}
+
+    return defect_centroids, cell, pbc
+
+
+def nn_histogram(nn_dists, bin_edges):
+    """Probability density of nearest-neighbor distances on fixed bins."""
+    hist, _ = np.histogram(nn_dists, bins=bin_edges)
+    return hist / (len(nn_dists) * np.diff(bin_edges))
+
+
+def analyze_frame(frame, args, signatures):
+    """Ordering metrics of one frame for a time series: RDFs, partial RDFs,
+    nearest-neighbor distance densities, Warren-Cowley parameters and S(q),
+    keyed by defect type ('All defects' for the combined centers) or type
+    pair. Returns None if the frame could not be read."""
+    try:
+        defect_centroids, cell, pbc = load_frame_centroids(args.path, frame, signatures)
+    except (OSError, ValueError) as error:
+        logging.warning(f'... {frame} could not be read: {error}')
+        return None
+    logging.info(f'Analyzing defect ordering for frame: {frame}')
+
+    type_names = list(defect_centroids.keys())
+    centroids_by_type = [np.array(defect_centroids[name]) for name in type_names]
+    positions = dict(zip(type_names, centroids_by_type))
+    if type_names:
+        positions['All defects'] = np.concatenate(centroids_by_type)
+    nn_edges = np.linspace(0, args.rdf_rmax, args.rdf_bins + 1)
+
+    result = {'counts': {name: len(p) for name, p in positions.items()},
+              'rdf': {}, 'nn_dist': {}, 'sq': {}, 'rdf_partial': {}, 'warren_cowley': {}}
+    for name, p in positions.items():
+        if len(p) >= 2:
+            result['rdf'][name] = compute_rdf(p, args.rdf_rmax, args.rdf_bins, cell, pbc)[0]
+            result['nn_dist'][name] = nn_histogram(
+                compute_nn_distribution(p, cell, pbc, args.rdf_rmax), nn_edges)
+        if len(p) >= 10:
+            result['sq'][name] = compute_structure_factor(
+                p, args.sq_qmax, args.sq_nq, cell, pbc, args.sq_rmax, args.sq_bin_width)[0]
+
+    if len(type_names) and len(positions['All defects']) >= 2:
+        partial_gr, _ = compute_partial_rdfs(centroids_by_type, args.rdf_rmax, args.rdf_bins, cell, pbc)
+        for i, name_i in enumerate(type_names):
+            for j, name_j in enumerate(type_names):
+                result['rdf_partial'][name_i, name_j] = partial_gr[i, j]
 
-# ------------------------------------------------------------------
-# 1. RDF of defect centers (grouped by type)
-# ------------------------------------------------------------------
-print("\n" + "-" * 70)
-print("1. RADIAL DISTRIBUTION FUNCTION (RDF)")
-print("-" * 70)
+    if len(type_names) >= 2:
+        shell_width = args.sro_shell_width if args.sro_shell_width > 0 else args.lattice_constant * 1.5
+        alpha, _ = compute_warren_cowley(centroids_by_type, type_names, args.sro_shells, shell_width, cell, pbc)
+        for i, name_i in enumerate(type_names):
+            for j, name_j in enumerate(type_names):
+                result['warren_cowley'][name_i, name_j] = alpha[:, i, j]
+    return result
+
+
+def stack_series(results, metric, types, length, pairs=False):
+    """Stack a per-type (or, with pairs, per-type-pair) metric of every frame
+    into a frames x types (x types) x length array, NaN where it was not
+    computed."""
+    shape = (len(results),) + (len(types),) * (2 if pairs else 1) + (length,)
+    series = np.full(shape, np.nan)
+    index = {name: k for k, name in enumerate(types)}
+    for t, r in enumerate(results):
+        for key, values in r[metric].items():
+            series[(t,) + (tuple(index[n] for n in key) if pairs else (index[key],))] = values
+    return series
+
+
+def write_time_series(frames, results, args):
+    """Write each metric of all frames as time-indexed arrays, one file per
+    metric in ordering/: rdf.npz (g(r, t) and partial g_AB(r, t)),
+    nn_dist.npz, sq.npz (S(q, t)) and warren_cowley.npz (alpha(shell, t))."""
+    results_dir = op.join(args.path, 'ordering')
+    os.makedirs(results_dir, exist_ok=True)
+
+    # Defect types in order of first appearance, the combined centers last
+    types = []
+    for r in results:
+        types.extend(name for name in r['counts'] if name not in types and name != 'All defects')
+    pair_types = list(types)
+    types.append('All defects')
+
+    steps = [int(m.group()) if m else t for t, m in enumerate(re.search(r'\d+', f) for f in frames)]
+    common = {'frame': np.array(frames), 'step': np.array(steps), 'types': np.array(types),
+              'counts': np.array([[r['counts'].get(name, 0) for name in types] for r in results])}
+
+    bin_edges = np.linspace(0, args.rdf_rmax, args.rdf_bins + 1)
+    r_values = 0.5 * (bin_edges[:-1] + bin_edges[1:])
+    shell_width = args.sro_shell_width if args.sro_shell_width > 0 else args.lattice_constant * 1.5
+    outputs = {
+        'rdf.npz': {'r_angstrom': r_values, 'g_r': stack_series(results, 'rdf', types, args.rdf_bins),
+                    'pair_types': np.array(pair_types),
+                    'g_r_partial': stack_series(results, 'rdf_partial', pair_types, args.rdf_bins, pairs=True)},
+        'nn_dist.npz': {'r_angstrom': r_values, 'p_nn': stack_series(results, 'nn_dist', types, args.rdf_bins)},
+        'sq.npz': {'q_inv_angstrom': np.linspace(0.01, args.sq_qmax, args.sq_nq),
+                   'S_q': stack_series(results, 'sq', types, args.sq_nq)},
+        'warren_cowley.npz': {'shell_center_angstrom': (np.arange(args.sro_shells) + 0.5) * shell_width,
+                              'pair_types': np.array(pair_types),
+                              'alpha': stack_series(results, 'warren_cowley', pair_types, args.sro_shells, pairs=True)},
+    }
+    for file_name, arrays in outputs.items():
+        with atomic_output(op.join(results_dir, file_name)) as tmp_path, open(tmp_path, 'wb') as f:
+            np.savez(f, **common, **arrays)
+        logging.info(f'... {file_name} written to {results_dir}')
+
+
+def report_frame(frame, args, signatures):
+    """Print the ordering analysis of one frame, and write its figures and
+    per-type CSVs."""
+    data_path = args.path
+    frame_name = frame + '.csv'
+    logging.info(f'Analyzing defect ordering for frame: {frame_name}')
+    defect_centroids, cell, pbc = load_frame_centroids(data_path, frame, signatures)
+    box_volume = cell_volume(cell)
+
+    # Report defect counts
+    print("=" * 70)
+    print("DEFECT ORDERING ANALYSIS")
+    print("=" * 70)
+    print(f"\nFrame: {frame_name}")
+    print(f"Cell volume: {box_volume:.1f} Å³ (periodic: {' '.join('xyz'[k] for k in range(3) if pbc[k]) or 'none'})")
+    print(f"\nDefect counts by type:")
+    all_centroids = []
+    for name, centroids in defect_centroids.items():
+        print(f"  {name}: {len(centroids)}")
+        all_centroids.extend(centroids)
+    all_centroids = np.array(all_centroids)
+    print(f"  Total (excl. GBS): {len(all_centroids)}")
+
+    type_names = list(defect_centroids.keys())
+    centroids_by_type = [np.array(defect_centroids[name]) for name in type_names]
+
+    # Create output directory
+    fig_dir = op.join(data_path, 'figures')
+    os.makedirs(fig_dir, exist_ok=True)
+    report_path = op.join(data_path, 'ordering_report.csv')
+
+    # ------------------------------------------------------------------
+    # 1. RDF of defect centers (grouped by type)
+    # ------------------------------------------------------------------
+    print("\n" + "-" * 70)
+    print("1. RADIAL DISTRIBUTION FUNCTION (RDF)")
+    print("-" * 70)
 
-fig, ax = plt.subplots(figsize=(10, 6))
+    fig, ax = plt.subplots(figsize=(10, 6))
 
-rdf_results = {}
-for name, centroids in defect_centroids.items():
-    positions = np.array(centroids)
-    if len(positions) < 2:
-        print(f"  {name}: too few defects for RDF (n={len(positions)})")
-        continue
-    
-    gr, r = compute_rdf(positions, args.rdf_rmax, args.rdf_bins, box_volume)
-    rdf_results[name] = (gr, r)
-    ax.plot(r, gr, label=f'{name} (n={len(positions)})', linewidth=1.5)
-    
-    # Report first peak
-    peak_idx = np.argmax(gr[5:]) + 5  # skip first few noisy bins
-    print(f"  {name}: first peak at r = {r[peak_idx]:.2f} Å, g(r) = {gr[peak_idx]:.2f}")
-
-# Also compute all-defect RDF
-if len(all_centroids) >= 2:
-    gr_all, r_all = compute_rdf(all_centroids, args.rdf_rmax, args.rdf_bins, box_volume)
-    ax.plot(r_all, gr_all, 'k--', label=f'All defects (n={len(all_centroids)})', linewidth=2)
-    peak_idx = np.argmax(gr_all[5:]) + 5
-    print(f"  All defects: first peak at r = {r_all[peak_idx]:.2f} Å, g(r) = {gr_all[peak_idx]:.2f}")
-
-ax.axhline(1.0, color='gray', linestyle=':', alpha=0.5)
-ax.set_xlabel('r (Å)')
-ax.set_ylabel('g(r)')
-ax.set_title('Radial Distribution Function of Defect Centers')
-ax.legend()
-ax.set_xlim(0, args.rdf_rmax)
-plt.tight_layout()
-plt.savefig(op.join(fig_dir, 'defect_rdf.png'), dpi=150)
-plt.close()
-print(f"\n  Figure saved: figures/defect_rdf.png")
+    rdf_results = {}
+    for name, centroids in defect_centroids.items():
+        positions = np.array(centroids)
+        if len(positions) < 2:
+            print(f"  {name}: too few defects for RDF (n={len(positions)})")
+            continue
+    
+        gr, r = compute_rdf(positions, args.rdf_rmax, args.rdf_bins, cell, pbc)
+        rdf_results[name] = (gr, r)
+        ax.plot(r, gr, label=f'{name} (n={len(positions)})', linewidth=1.5)
+    
+        # Report first peak
+        peak_idx = np.argmax(gr[5:]) + 5  # skip first few noisy bins
+        print(f"  {name}: first peak at r = {r[peak_idx]:.2f} Å, g(r) = {gr[peak_idx]:.2f}")
+
+    # Also compute all-defect RDF
+    if len(all_centroids) >= 2:
+        gr_all, r_all = compute_rdf(all_centroids, args.rdf_rmax, args.rdf_bins, cell, pbc)
+        ax.plot(r_all, gr_all, 'k--', label=f'All defects (n={len(all_centroids)})', linewidth=2)
+        peak_idx = np.argmax(gr_all[5:]) + 5
+        print(f"  All defects: first peak at r = {r_all[peak_idx]:.2f} Å, g(r) = {gr_all[peak_idx]:.2f}")
+
+    # Partial RDFs of every pair of types, from one pair enumeration
+    partial_gr = None
+    if len(all_centroids) >= 2:
+        partial_gr, r_partial = compute_partial_rdfs(centroids_by_type, args.rdf_rmax, args.rdf_bins, cell, pbc)
+        for i, name_i in enumerate(type_names):
+            for j in range(i + 1, len(type_names)):
+                peak_idx = np.argmax(partial_gr[i, j, 5:]) + 5
+                print(f"  {name_i} - {type_names[j]}: first peak at r = {r_partial[peak_idx]:.2f} Å, "
+                      f"g(r) = {partial_gr[i, j, peak_idx]:.2f}")
+
+    ax.axhline(1.0, color='gray', linestyle=':', alpha=0.5)
+    ax.set_xlabel('r (Å)')
+    ax.set_ylabel('g(r)')
+    ax.set_title('Radial Distribution Function of Defect Centers')
+    ax.legend()
+    ax.set_xlim(0, args.rdf_rmax)
+    plt.tight_layout()
+    plt.savefig(op.join(fig_dir, 'defect_rdf.png'), dpi=150)
+    plt.close()
+    print(f"\n  Figure saved: figures/defect_rdf.png")
 
-# ------------------------------------------------------------------
-# 2. Nearest-Neighbor Distance Distribution
-# ------------------------------------------------------------------
-print("\n" + "-" * 70)
-print("2. NEAREST-NEIGHBOR DISTANCE DISTRIBUTION")
-print("-" * 70)
+    # ------------------------------------------------------------------
+    # 2. Nearest-Neighbor Distance Distribution
+    # ------------------------------------------------------------------
+    print("\n" + "-" * 70)
+    print("2. NEAREST-NEIGHBOR DISTANCE DISTRIBUTION")
+    print("-" * 70)
 
-fig, ax = plt.subplots(figsize=(10, 6))
+    fig, ax = plt.subplots(figsize=(10, 6))
 
-nn_results = {}
-for name, centroids in defect_centroids.items():
-    positions = np.array(centroids)
-    if len(positions) < 2:
-        continue
-    
-    nn_dists = compute_nn_distribution(positions)
-    nn_results[name] = nn_dists
-    
-    ax.hist(nn_dists, bins=80, alpha=0.5, density=True,
-            label=f'{name} (mean={nn_dists.mean():.1f} Å)')
-    
-    print(f"  {name}: mean NN dist = {nn_dists.mean():.2f} Å, "
-          f"std = {nn_dists.std():.2f} Å, min = {nn_dists.min():.2f} Å")
-
-# Plot Hertz distribution for comparison (random expectation)
-if len(all_centroids) >= 2:
-    density_all = len(all_centroids) / box_volume
-    r_hertz = np.linspace(0.1, args.rdf_rmax * 0.5, 200)
-    p_hertz = hertz_distribution(r_hertz, density_all)
-    ax.plot(r_hertz, p_hertz, 'k--', linewidth=2, label='Random (Hertz)')
+    nn_results = {}
+    for name, centroids in defect_centroids.items():
+        positions = np.array(centroids)
+        if len(positions) < 2:
+            continue
+    
+        nn_dists = compute_nn_distribution(positions, cell, pbc, args.rdf_rmax)
+        nn_results[name] = nn_dists
+    
+        ax.hist(nn_dists, bins=80, alpha=0.5, density=True,
+                label=f'{name} (mean={nn_dists.mean():.1f} Å)')
+    
+        print(f"  {name}: mean NN dist = {nn_dists.mean():.2f} Å, "
+              f"std = {nn_dists.std():.2f} Å, min = {nn_dists.min():.2f} Å")
+
+    # Plot Hertz distribution for comparison (random expectation)
+    if len(all_centroids) >= 2:
+        density_all = len(all_centroids) / box_volume
+        r_hertz = np.linspace(0.1, args.rdf_rmax * 0.5, 200)
+        p_hertz = hertz_distribution(r_hertz, density_all)
+        ax.plot(r_hertz, p_hertz, 'k--', linewidth=2, label='Random (Hertz)')
+    
+        nn_all = compute_nn_distribution(all_centroids, cell, pbc, args.rdf_rmax)
+        ax.hist(nn_all, bins=80, alpha=0.3, density=True, color='gray',
+                label=f'All defects (mean={nn_all.mean():.1f} Å)')
+        print(f"  All defects: mean NN dist = {nn_all.mean():.2f} Å, "
+              f"std = {nn_all.std():.2f} Å")
+        print(f"  Random expectation (Hertz): mean = {(0.5541 / density_all**(1/3)):.2f} Å")
+
+    ax.set_xlabel('Nearest-Neighbor Distance (Å)')
+    ax.set_ylabel('Probability Density')
+    ax.set_title('Nearest-Neighbor Distance Distribution of Defect Centers')
+    ax.legend()
+    plt.tight_layout()
+    plt.savefig(op.join(fig_dir, 'defect_nn_distribution.png'), dpi=150)
+    plt.close()
+    print(f"\n  Figure saved: figures/defect_nn_distribution.png")
+
+    # ------------------------------------------------------------------
+    # 3. Warren-Cowley SRO Parameters
+    # ------------------------------------------------------------------
+    print("\n" + "-" * 70)
+    print("3. WARREN-COWLEY SHORT-RANGE ORDER PARAMETERS")
+    print("-" * 70)
+
+    # Determine shell width
+    shell_width = args.sro_shell_width if args.sro_shell_width > 0 else args.lattice_constant * 1.5
+    n_shells = args.sro_shells
+
+    # Only compute if multiple types exist
+    if len(type_names) >= 2 and all(len(c) >= 1 for c in centroids_by_type):
+        alpha, shell_centers = compute_warren_cowley(
+            centroids_by_type, type_names, n_shells, shell_width, cell, pbc)
+    
+        print(f"\n  Shell width: {shell_width:.2f} Å")
+        print(f"  Number of shells: {n_shells}")
+        print(f"\n  α_ij values (shell 1, r = {shell_centers[0]:.1f} Å):")
+        print(f"  {'':20s}", end='')
+        for name in type_names:
+            print(f"{name[:12]:>14s}", end='')
+        print()
     
-    nn_all = compute_nn_distribution(all_centroids)
-    ax.hist(nn_all, bins=80, alpha=0.3, density=True, color='gray',
-            label=f'All defects (mean={nn_all.mean():.1f} Å)')
-    print(f"  All defects: mean NN dist = {nn_all.mean():.2f} Å, "
-          f"std = {nn_all.std():.2f} Å")
-    print(f"  Random expectation (Hertz): mean = {(0.5541 / density_all**(1/3)):.2f} Å")
-
-ax.set_xlabel('Nearest-Neighbor Distance (Å)')
-ax.set_ylabel('Probability Density')
-ax.set_title('Nearest-Neighbor Distance Distribution of Defect Centers')
-ax.legend()
-plt.tight_layout()
-plt.savefig(op.join(fig_dir, 'defect_nn_distribution.png'), dpi=150)
-plt.close()
-print(f"\n  Figure saved: figures/defect_nn_distribution.png")
-
-# ------------------------------------------------------------------
-# 3. Warren-Cowley SRO Parameters
-# ------------------------------------------------------------------
-print("\n" + "-" * 70)
-print("3. WARREN-COWLEY SHORT-RANGE ORDER PARAMETERS")
-print("-" * 70)
-
-# Determine shell width
-shell_width = args.sro_shell_width if args.sro_shell_width > 0 else args.lattice_constant * 1.5
-n_shells = args.sro_shells
+        for i, name_i in enumerate(type_names):
+            print(f"  {name_i:20s}", end='')
+            for j, name_j in enumerate(type_names):
+                print(f"{alpha[0, i, j]:14.4f}", end='')
+            print()
+    
+        print(f"\n  Interpretation:")
+        print(f"    α < 0 → unlike defects attract (ordering)")
+        print(f"    α = 0 → random distribution")
+        print(f"    α > 0 → like defects cluster (segregation)")
+    
+        # Plot alpha vs shell for each pair
+        fig, ax = plt.subplots(figsize=(10, 6))
+        for i in range(len(type_names)):
+            for j in range(i, len(type_names)):
+                label = f'{type_names[i][:8]}-{type_names[j][:8]}'
+                ax.plot(shell_centers, alpha[:, i, j], 'o-', label=label)
+    
+        ax.axhline(0, color='gray', linestyle=':', alpha=0.5)
+        ax.set_xlabel('Shell distance (Å)')
+        ax.set_ylabel('Warren-Cowley α')
+        ax.set_title('Warren-Cowley Short-Range Order Parameters')
+        ax.legend(fontsize=8)
+        plt.tight_layout()
+        plt.savefig(op.join(fig_dir, 'defect_warren_cowley.png'), dpi=150)
+        plt.close()
+        print(f"\n  Figure saved: figures/defect_warren_cowley.png")
+    else:
+        print("  Skipped: need at least 2 defect types for Warren-Cowley analysis")
+        alpha = None
 
-type_names = list(defect_centroids.keys())
-centroids_by_type = [np.array(defect_centroids[name]) for name in type_names]
+    # ------------------------------------------------------------------
+    # 4. Structure Factor S(q) / Fourier Analysis
+    # ------------------------------------------------------------------
+    print("\n" + "-" * 70)
+    print("4. STRUCTURE FACTOR S(q)")
+    print("-" * 70)
 
-# Only compute if multiple types exist
-if len(type_names) >= 2 and all(len(c) >= 1 for c in centroids_by_type):
-    alpha, shell_centers = compute_warren_cowley(
-        centroids_by_type, type_names, n_shells, shell_width)
-    
-    print(f"\n  Shell width: {shell_width:.2f} Å")
-    print(f"  Number of shells: {n_shells}")
-    print(f"\n  α_ij values (shell 1, r = {shell_centers[0]:.1f} Å):")
-    print(f"  {'':20s}", end='')
-    for name in type_names:
-        print(f"{name[:12]:>14s}", end='')
-    print()
-    
-    for i, name_i in enumerate(type_names):
-        print(f"  {name_i:20s}", end='')
-        for j, name_j in enumerate(type_names):
-            print(f"{alpha[0, i, j]:14.4f}", end='')
-        print()
-    
-    print(f"\n  Interpretation:")
-    print(f"    α < 0 → unlike defects attract (ordering)")
-    print(f"    α = 0 → random distribution")
-    print(f"    α > 0 → like defects cluster (segregation)")
-    
-    # Plot alpha vs shell for each pair
     fig, ax = plt.subplots(figsize=(10, 6))
-    for i in range(len(type_names)):
-        for j in range(i, len(type_names)):
-            label = f'{type_names[i][:8]}-{type_names[j][:8]}'
-            ax.plot(shell_centers, alpha[:, i, j], 'o-', label=label)
-    
-    ax.axhline(0, color='gray', linestyle=':', alpha=0.5)
-    ax.set_xlabel('Shell distance (Å)')
-    ax.set_ylabel('Warren-Cowley α')
-    ax.set_title('Warren-Cowley Short-Range Order Parameters')
-    ax.legend(fontsize=8)
+
+    sq_results = {}
+    for name, centroids in defect_centroids.items():
+        positions = np.array(centroids)
+        if len(positions) < 10:
+            print(f"  {name}: too few defects for S(q) (n={len(positions)})")
+            continue
+    
+        Sq, q = compute_structure_factor(positions, args.sq_qmax, args.sq_nq, cell, pbc,
+                                         args.sq_rmax, args.sq_bin_width)
+        sq_results[name] = (Sq, q)
+        ax.plot(q, Sq, label=f'{name} (n={len(positions)})', linewidth=1.5)
+
+    # All defects combined
+    if len(all_centroids) >= 10:
+        Sq_all, q_all = compute_structure_factor(all_centroids, args.sq_qmax, args.sq_nq, cell, pbc,
+                                                 args.sq_rmax, args.sq_bin_width)
+        ax.plot(q_all, Sq_all, 'k--', label='All defects', linewidth=2)
+    
+        # Find peaks in S(q)
+        from scipy.signal import find_peaks
+        peaks, properties = find_peaks(Sq_all, height=1.5, distance=20)
+        if len(peaks) > 0:
+            print(f"\n  Peaks in S(q) for all defects:")
+            for p in peaks[:5]:
+                real_space = 2 * np.pi / q_all[p]
+                print(f"    q = {q_all[p]:.4f} Å⁻¹  →  d = {real_space:.1f} Å  "
+                      f"(S = {Sq_all[p]:.2f})")
+            print(f"\n  Interpretation: peaks indicate preferred periodic spacing")
+            print(f"    Strong sharp peaks → long-range defect superlattice")
+            print(f"    Broad peaks → short-range correlations only")
+        else:
+            print(f"\n  No significant peaks in S(q) → defects lack long-range periodicity")
+
+    ax.axhline(1.0, color='gray', linestyle=':', alpha=0.5)
+    ax.set_xlabel('q (Å⁻¹)')
+    ax.set_ylabel('S(q)')
+    ax.set_title('Structure Factor of Defect Centers')
+    ax.legend()
+    ax.set_xlim(0, args.sq_qmax)
     plt.tight_layout()
-    plt.savefig(op.join(fig_dir, 'defect_warren_cowley.png'), dpi=150)
+    plt.savefig(op.join(fig_dir, 'defect_structure_factor.png'), dpi=150)
     plt.close()
-    print(f"\n  Figure saved: figures/defect_warren_cowley.png")
-else:
-    print("  Skipped: need at least 2 defect types for Warren-Cowley analysis")
-    alpha = None
+    print(f"\n  Figure saved: figures/defect_structure_factor.png")
+
+    # ------------------------------------------------------------------
+    # Save numerical results
+    # ------------------------------------------------------------------
+    results_dir = op.join(data_path, 'ordering')
+    os.makedirs(results_dir, exist_ok=True)
+
+    # Save RDF data
+    for name, (gr, r) in rdf_results.items():
+        safe_name = name.replace(' ', '_').replace('(', '').replace(')', '')
+        pd.DataFrame({'r_angstrom': r, 'g_r': gr}).to_csv(
+            op.join(results_dir, f'rdf_{safe_name}.csv'), index=False)
+
+    # Save partial RDFs of all type pairs
+    if partial_gr is not None:
+        n_types = len(type_names)
+        pd.DataFrame({
+            'r_angstrom': np.tile(r_partial, n_types * n_types),
+            'type_i': np.repeat(type_names, n_types * len(r_partial)),
+            'type_j': np.tile(np.repeat(type_names, len(r_partial)), n_types),
+            'g_r': partial_gr.ravel()
+        }).to_csv(op.join(results_dir, 'rdf_partial.csv'), index=False)
+
+    # Save NN distributions
+    for name, nn_dists in nn_results.items():
+        safe_name = name.replace(' ', '_').replace('(', '').replace(')', '')
+        pd.DataFrame({'nn_distance_angstrom': nn_dists}).to_csv(
+            op.join(results_dir, f'nn_dist_{safe_name}.csv'), index=False)
+
+    # Save S(q) data
+    for name, (Sq, q) in sq_results.items():
+        safe_name = name.replace(' ', '_').replace('(', '').replace(')', '')
+        pd.DataFrame({'q_inv_angstrom': q, 'S_q': Sq}).to_csv(
+            op.join(results_dir, f'sq_{safe_name}.csv'), index=False)
+
+    # Save Warren-Cowley parameters
+    if alpha is not None:
+        rows = []
+        for shell_idx in range(n_shells):
+            for i, name_i in enumerate(type_names):
+                for j, name_j in enumerate(type_names):
+                    rows.append({
+                        'shell': shell_idx + 1,
+                        'shell_center_angstrom': shell_centers[shell_idx],
+                        'type_i': name_i,
+                        'type_j': name_j,
+                        'alpha': alpha[shell_idx, i, j]
+                    })
+        pd.DataFrame(rows).to_csv(op.join(results_dir, 'warren_cowley.csv'), index=False)
+
+    print("\n" + "=" * 70)
+    print("ANALYSIS COMPLETE")
+    print("=" * 70)
+    print(f"\nNumerical results saved to: {results_dir}/")
+    print(f"Figures saved to: {fig_dir}/")
 
-# ------------------------------------------------------------------
-# 4. Structure Factor S(q) / Fourier Analysis
-# ------------------------------------------------------------------
-print("\n" + "-" * 70)
-print("4. STRUCTURE FACTOR S(q)")
-print("-" * 70)
-
-fig, ax = plt.subplots(figsize=(10, 6))
-
-sq_results = {}
-for name, centroids in defect_centroids.items():
-    positions = np.array(centroids)
-    if len(positions) < 10:
-        print(f"  {name}: too few defects for S(q) (n={len(positions)})")
-        continue
-    
-    # For large sets, subsample to keep computation tractable
-    if len(positions) > 5000:
-        rng = np.random.default_rng(42)
-        idx = rng.choice(len(positions), 5000, replace=False)
-        positions_sub = positions[idx]
-        print(f"  {name}: subsampled to 5000 for S(q) computation")
-    else:
-        positions_sub = positions
-    
-    Sq, q = compute_structure_factor(positions_sub, args.sq_qmax, args.sq_nq)
-    sq_results[name] = (Sq, q)
-    ax.plot(q, Sq, label=f'{name} (n={len(positions)})', linewidth=1.5)
-
-# All defects combined
-if len(all_centroids) >= 10:
-    if len(all_centroids) > 5000:
-        rng = np.random.default_rng(42)
-        idx = rng.choice(len(all_centroids), 5000, replace=False)
-        all_sub = all_centroids[idx]
-    else:
-        all_sub = all_centroids
-    Sq_all, q_all = compute_structure_factor(all_sub, args.sq_qmax, args.sq_nq)
-    ax.plot(q_all, Sq_all, 'k--', label='All defects', linewidth=2)
-    
-    # Find peaks in S(q)
-    from scipy.signal import find_peaks
-    peaks, properties = find_peaks(Sq_all, height=1.5, distance=20)
-    if len(peaks) > 0:
-        print(f"\n  Peaks in S(q) for all defects:")
-        for p in peaks[:5]:
-            real_space = 2 * np.pi / q_all[p]
-            print(f"    q = {q_all[p]:.4f} Å⁻¹  →  d = {real_space:.1f} Å  "
-                  f"(S = {Sq_all[p]:.2f})")
-        print(f"\n  Interpretation: peaks indicate preferred periodic spacing")
-        print(f"    Strong sharp peaks → long-range defect superlattice")
-        print(f"    Broad peaks → short-range correlations only")
-    else:
-        print(f"\n  No significant peaks in S(q) → defects lack long-range periodicity")
-
-ax.axhline(1.0, color='gray', linestyle=':', alpha=0.5)
-ax.set_xlabel('q (Å⁻¹)')
-ax.set_ylabel('S(q)')
-ax.set_title('Structure Factor of Defect Centers')
-ax.legend()
-ax.set_xlim(0, args.sq_qmax)
-plt.tight_layout()
-plt.savefig(op.join(fig_dir, 'defect_structure_factor.png'), dpi=150)
-plt.close()
-print(f"\n  Figure saved: figures/defect_structure_factor.png")
 
 # ------------------------------------------------------------------
-# Save numerical results
+# Main analysis
 # ------------------------------------------------------------------
-results_dir = op.join(data_path, 'ordering')
-os.makedirs(results_dir, exist_ok=True)
-
-# Save RDF data
-for name, (gr, r) in rdf_results.items():
-    safe_name = name.replace(' ', '_').replace('(', '').replace(')', '')
-    pd.DataFrame({'r_angstrom': r, 'g_r': gr}).to_csv(
-        op.join(results_dir, f'rdf_{safe_name}.csv'), index=False)
-
-# Save NN distributions
-for name, nn_dists in nn_results.items():
-    safe_name = name.replace(' ', '_').replace('(', '').replace(')', '')
-    pd.DataFrame({'nn_distance_angstrom': nn_dists}).to_csv(
-        op.join(results_dir, f'nn_dist_{safe_name}.csv'), index=False)
-
-# Save S(q) data
-for name, (Sq, q) in sq_results.items():
-    safe_name = name.replace(' ', '_').replace('(', '').replace(')', '')
-    pd.DataFrame({'q_inv_angstrom': q, 'S_q': Sq}).to_csv(
-        op.join(results_dir, f'sq_{safe_name}.csv'), index=False)
-
-# Save Warren-Cowley parameters
-if alpha is not None:
-    rows = []
-    for shell_idx in range(n_shells):
-        for i, name_i in enumerate(type_names):
-            for j, name_j in enumerate(type_names):
-                rows.append({
-                    'shell': shell_idx + 1,
-                    'shell_center_angstrom': shell_centers[shell_idx],
-                    'type_i': name_i,
-                    'type_j': name_j,
-                    'alpha': alpha[shell_idx, i, j]
-                })
-    pd.DataFrame(rows).to_csv(op.join(results_dir, 'warren_cowley.csv'), index=False)
-
-print("\n" + "=" * 70)
-print("ANALYSIS COMPLETE")
-print("=" * 70)
-print(f"\nNumerical results saved to: {results_dir}/")
-print(f"Figures saved to: {fig_dir}/")
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    # Find all component CSVs, in numeric frame order
+    components_csv_dir = op.join(args.path, 'components', 'csvs')
+    frames = sorted([f.replace('.csv', '') for f in os.listdir(components_csv_dir) if f.endswith('.csv')],
+                    key=frame_sort_key)
+    if not frames:
+        logging.error('No component CSVs found')
+        raise SystemExit(1)
+
+    signatures = load_signatures(args.lattice, args.signatures)
+    if args.frames is None:
+        # Use the first frame (or only frame)
+        try:
+            report_frame(frames[0], args, signatures)
+        except FileNotFoundError as error:
+            logging.error(error)
+            raise SystemExit(1)
+    else:
+        # Analyze the selected frames, in parallel if requested, and write
+        # every metric as a time series
+        frames = frames[parse_frame_slice(args.frames)]
+        logging.info(f'{len(frames)} frames selected for the ordering time series')
+        if args.workers > 1:
+            with ProcessPoolExecutor(max_workers=args.workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = {pool.submit(analyze_frame, frame, args, signatures): frame for frame in frames}
+                results = {futures[future]: future.result() for future in as_completed(futures)}
+        else:
+            results = {frame: analyze_frame(frame, args, signatures) for frame in frames}
+        frames = [frame for frame in frames if results[frame] is not None]
+        write_time_series(frames, [results[frame] for frame in frames], args)
+        print(f"\nTime series of {len(frames)} frames saved to: {op.join(args.path, 'ordering')}/")
@@ -0,0 +1,133 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+
+import json
+import numpy as np
+import pandas as pd
+
+# Defect signatures (Nodes, Edges) of vacancy clusters in each lattice, for a
+# neighbor cutoff between the first and second neighbor shells (between the
+# second and third for BCC, i.e. 14 ideal neighbors). An edge count of None
+# matches components of that size with any number of edges
+SIGNATURES = {
+    'FCC': {
+        'Mono-vacancy': (12, 24),
+        'Di-vacancy': (18, 40),
+        'Tri-vacancy (linear)': (24, 60),
+        'Tri-vacancy (triangular)': (24, 54),
+        'Adjacent mono-vac (square face, 4 shared)': (20, None),
+        'Adjacent mono-vac (triangle face, 3 shared)': (21, None),
+        'Adjacent mono-vac (face edge, 2 shared)': (22, None),
+        'Adjacent mono-vac (face corner, 1 shared)': (23, None),
+    },
+    'BCC': {
+        'Mono-vacancy': (14, 36),
+        'Di-vacancy (1st neighbors)': (20, 54),
+        'Di-vacancy (2nd neighbors)': (22, 64),
+    },
+    'HCP': {
+        'Mono-vacancy': (12, 24),
+        'Di-vacancy': (18, 40),
+    },
+}
+
+# Neighbor shells (in lattice constants; the basal one for HCP, with an ideal
+# c/a ratio) between which the cutoff of each lattice lies, and the ideal
+# number of neighbors within that cutoff
+CUTOFF_SHELLS = {'FCC': (np.sqrt(2)/2, 1.0), 'BCC': (1.0, np.sqrt(2)), 'HCP': (1.0, np.sqrt(2))}
+IDEAL_NEIGHBORS = {'FCC': 12, 'BCC': 14, 'HCP': 12}
+
+# Type of the largest component and of components matching no signature
+GBS = 'GBS'
+UNCLASSIFIED = 'Unclassified'
+
+
+def load_signatures(lattice='FCC', path=None):
+    """Defect signatures of a lattice, or those read from a JSON file mapping
+    type names to [nodes, edges] (edges null for any count). The file may
+    also map lattice names to such mappings, of which *lattice* is used."""
+    if path is None:
+        return dict(SIGNATURES[lattice.upper()])
+    with open(path) as f:
+        config = json.load(f)
+    if lattice.upper() in config and isinstance(config[lattice.upper()], dict):
+        config = config[lattice.upper()]
+    signatures = {name: (int(nodes), None if edges is None else int(edges))
+                  for name, (nodes, edges) in config.items()}
+    check_signatures(signatures)
+    return signatures
+
+
+def check_signatures(signatures):
+    """Raise a ValueError if two types share a signature, which would make
+    the classification ambiguous."""
+    seen = {}
+    for name, signature in signatures.items():
+        if signature in seen:
+            nodes, edges = signature
+            raise ValueError(f'Defect types {seen[signature]!r} and {name!r} share the signature '
+                             f'({nodes}, {"any" if edges is None else edges})')
+        seen[signature] = name
+
+
+def defect_types(signatures):
+    """All types a classification with these signatures can produce, in order."""
+    return list(signatures) + [UNCLASSIFIED]
+
+
+def _lookup(keys, table_keys, table_values):
+    """Hashed join of keys on a table, -1 where a key is not in the table."""
+    position = pd.Index(table_keys).get_indexer(keys)
+    return np.append(np.asarray(table_values, dtype=np.int64), -1)[position]
+
+
+def classify_components(info, signatures, gbs=True):
+    """Defect type of every component of a component table, from a hashed join
+    of its (Nodes, Edges) on the signatures. Exact signatures take precedence
+    over node-only ones; with gbs, component 0 (the largest) is the grain
+    boundary superstructure (GBS)."""
+    names = np.array(defect_types(signatures), dtype=object)
+    nodes = info['Nodes'].values.astype(np.int64)
+    edges = info['Edges'].values.astype(np.int64)
+
+    # Index of the matching signature of every component, -1 if none; the
+    # (nodes, edges) pair is packed into one 64-bit key
+    exact = [(k, n, e) for k, (n, e) in enumerate(signatures.values()) if e is not None]
+    match = _lookup((nodes << 32) | edges, [(n << 32) | e for _, n, e in exact], [k for k, _, _ in exact])
+    nodes_only = [(k, n) for k, (n, e) in enumerate(signatures.values()) if e is None]
+    if nodes_only:
+        by_nodes = _lookup(nodes, [n for _, n in nodes_only], [k for k, _ in nodes_only])
+        match = np.where(match >= 0, match, by_nodes)
+
+    types = pd.Series(names[match], index=info.index)  # -1 picks UNCLASSIFIED
+    if gbs:
+        types[info['Component'].values == 0] = GBS
+    return types
+
+
+def type_counts(types, signatures):
+    """Number of components of every type (the GBS excluded), including types
+    not among the signatures (e.g. from a Type column of another classification)."""
+    types = types[types != GBS]
+    order = defect_types(signatures)
+    order += [name for name in pd.unique(types) if name not in order]
+    return types.value_counts().reindex(order, fill_value=0)
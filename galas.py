@@ -0,0 +1,161 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+
+import os
+import os.path as op
+import numpy as np
+import pandas as pd
+from ovito.data import CutoffNeighborFinder
+import logging
+import argparse
+from galas_io import (atomic_output, parse_frame_slice, save_graph, atom_table_path,
+                      write_atom_table, write_atom_index, write_cell, TrajectoryStore)
+from collect_neighbors import (iter_neighbor_chunks, chunks_to_csr, atomic_volumes, atom_table,
+                               build_pipeline, trajectory_frame_name, neighbor_cutoff)
+from generate_components import find_components, summary_row
+from build_trajectory_store import STORE_COLUMNS, component_labels
+from defect_types import SIGNATURES, IDEAL_NEIGHBORS, load_signatures, classify_components
+
+parser = argparse.ArgumentParser(description='Run the GALAS pipeline in one process: neighbors, '
+                                             'graphs, components, classification and summary')
+parser.add_argument('--path', type=str, default='./data/', 
+                    help='Path to data folder')
+parser.add_argument('--trajectory', type=str, default='dump.*.txt',
+                    help='Multi-frame dump or wildcard sequence in dumps/')
+parser.add_argument('--frames', type=str, default=':',
+                    help='Frame selection start:stop:step')
+parser.add_argument('--lattice_constant', type=float, default=4.0559, 
+                    help='Ideal lattice constant -- default for FCC Al at 300 K')
+parser.add_argument('--ideal_neighbors', type=int, default=None,
+                    help='Ideal number of neighbors within the cutoff (default: 12 for FCC and HCP, 14 for BCC)')
+parser.add_argument('--lattice', type=str, default='FCC', choices=list(SIGNATURES),
+                    help='Lattice whose neighbor shells set the cutoff and whose defect signatures '
+                         'classify the components')
+parser.add_argument('--signatures', type=str, default=None,
+                    help='JSON file of defect signatures {type: [nodes, edges]} replacing the built-in ones')
+parser.add_argument('--voronoi', type=str, default=None, choices=['all', 'defects', 'none'],
+                    help='Atomic volumes for the per-atom tables (default: all if tables are saved, else none)')
+parser.add_argument('--chunk_size', type=int, default=1000000,
+                    help='Number of central atoms per neighbor query (0 = whole frame at once)')
+parser.add_argument('--save', type=str, nargs='*', default=[],
+                    choices=['graphs', 'tables', 'components', 'trajectory'],
+                    help='Intermediate files to write: graphs/<frame>.npz, per-atom tables, '
+                         'components/<frame>.npz and .meta.npz, per-atom time series in trajectory/')
+parser.add_argument('--table_format', type=str, default='parquet', choices=['parquet', 'feather', 'csv'],
+                    help='Storage format of saved per-atom tables')
+
+
+def analyze_frame(data, load_file, args, signatures, store=None):
+    """Run all stages on one computed frame, keeping its arrays in memory, and
+    append it to the trajectory store if given. Components are classified
+    with the given defect signatures. Returns the frame's
+    all_component_data.csv row and its defect type counts."""
+    # Neighbor collection straight into the half-symmetric graph
+    cutoff = neighbor_cutoff(args.lattice_constant, args.lattice)
+    finder = CutoffNeighborFinder(cutoff, data)
+    n_neighbors = np.zeros(data.particles.count, dtype=np.int32)
+    chunks = iter_neighbor_chunks(finder, range(data.particles.count), args.chunk_size, n_neighbors)
+    A = chunks_to_csr(chunks, data.particles.count)
+    logging.info(f'... {2*A.nnz} neighbor pairs within {cutoff:0.3f} A')
+
+    # Per-atom table with the neighbor columns
+    atomic_volume = atomic_volumes(data, finder, n_neighbors, args)
+    df = atom_table(data, np.asarray(data.particles['Structure Type']), atomic_volume, n_neighbors, A)
+    del finder
+
+    # Components and their classification
+    A_defect, defect_indices, labels, info = find_components(A, df, args.ideal_neighbors)
+    info['Type'] = classify_components(info, signatures)
+    info.to_csv(op.join(args.path, 'components', 'csvs', load_file + '.csv'), index=False)
+    counts = info['Type'].value_counts()
+    logging.info(f'... {len(info)} components, {counts.get("Mono-vacancy", 0)} mono-vacancies')
+
+    # Intermediate files, only when asked for
+    if 'graphs' in args.save:
+        with atomic_output(op.join(args.path, 'graphs', load_file + '.npz')) as tmp_file:
+            save_graph(tmp_file, A)
+    if 'tables' in args.save:
+        write_atom_table(df, atom_table_path(args.path, load_file, args.table_format))
+        write_atom_index(args.path, load_file, df['idx'].values)
+        write_cell(args.path, load_file, np.asarray(data.cell[...]), data.cell.pbc)
+    if 'components' in args.save:
+        with atomic_output(op.join(args.path, 'components', load_file + '.npz')) as tmp_file:
+            save_graph(tmp_file, A_defect)
+        with atomic_output(op.join(args.path, 'components', load_file + '.meta.npz')) as tmp_file, \
+                open(tmp_file, 'wb') as f:
+            np.savez(f, defect_indices=defect_indices, labels=labels,
+                     defect_ids=df['idx'].values[defect_indices].astype(np.int64))
+    if store is not None:
+        values = {column: df[column].values for column in STORE_COLUMNS[1:]}
+        values['component'] = component_labels(len(df), defect_indices, labels)
+        store.append(load_file, df['idx'].values, values)
+
+    return summary_row(load_file + '.npz', A, info), counts
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.ideal_neighbors is None:
+        args.ideal_neighbors = IDEAL_NEIGHBORS[args.lattice]
+    if args.voronoi is None:
+        args.voronoi = 'all' if 'tables' in args.save else 'none'
+
+    # NOTE: code assumes dumps folder already present and populated
+    for folder in ('graphs', 'components', op.join('components', 'csvs')):
+        os.makedirs(op.join(args.path, folder), exist_ok=True)
+
+    # One pipeline streams every selected frame; Ovito and the modifiers are set up once
+    pipeline = build_pipeline(op.join(args.path, 'dumps', args.trajectory), args.voronoi)
+    frames = list(range(pipeline.source.num_frames))[parse_frame_slice(args.frames)]
+    multi_frame_file = '*' not in args.trajectory
+    logging.info(f'{len(frames)} frames selected from {args.trajectory}')
+
+    signatures = load_signatures(args.lattice, args.signatures)
+    store = TrajectoryStore(args.path) if 'trajectory' in args.save else None
+
+    # The summary of all frames is written row by row, in frame order, as
+    # each frame completes; frames that fail to compute are skipped
+    all_component_path = op.join(args.path, 'all_component_data.csv')
+    all_counts = {}
+    try:
+        with open(all_component_path, 'w') as summary:
+            summary.write("frame,nodes,edges,components,largest_grain\n")
+            for frame in frames:
+                try:
+                    data = pipeline.compute(frame)
+                except:
+                    logging.warning(f'... frame {frame} could not be computed by Ovito')
+                    continue
+                load_file = trajectory_frame_name(data.attributes, multi_frame_file)
+                logging.info(f'Analyzing frame {frame} ({load_file})')
+                row, all_counts[load_file] = analyze_frame(data, load_file, args, signatures, store)
+                summary.write(row)
+                summary.flush()
+                del data
+        logging.info(f'... component info written to {all_component_path}')
+    finally:
+        # Defect type counts of the frames done so far, even after an error
+        counts_path = op.join(args.path, 'defect_counts.csv')
+        counts = pd.DataFrame(all_counts).T.fillna(0).astype(int)
+        counts.index.name = 'frame'
+        counts.to_csv(counts_path)
+        logging.info(f'... defect type counts written to {counts_path}')
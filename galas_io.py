@@ -0,0 +1,677 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+import os
+import os.path as op
+import re
+import gzip
+import json
+import mmap
+import time
+import atexit
+import bisect
+import hashlib
+import shutil
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix, triu
+
+# Binary neighbor-pair format: a 32-byte header followed by three contiguous
+# little-endian columns (src int32, dst int32, weight float32), each n_pairs long
+NEIGHBOR_MAGIC = b'GALASNBR'
+NEIGHBOR_VERSION = 1
+NEIGHBOR_HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('sorted', '<u4'),
+                            ('n_atoms', '<i8'), ('n_pairs', '<i8')])
+NEIGHBOR_COLUMNS = (('src', '<i4'), ('dst', '<i4'), ('weight', '<f4'))
+
+# Per-atom tables: storage dtypes of the known columns (any other float64
+# column is stored as float32) and the supported formats, in lookup order
+ATOM_TABLE_DTYPES = {'idx': np.int32, 'atom_type': np.int8, 'structure_type': np.int8,
+                     'atomic_volume': np.float32, 'x': np.float32, 'y': np.float32,
+                     'z': np.float32, 'n_neighbors': np.int16,
+                     'summed_neighbor_distances': np.float32, 'norm_distances': np.float32,
+                     'triangles': np.int32}
+ATOM_TABLE_FORMATS = ('parquet', 'feather', 'csv')
+
+
+@contextmanager
+def atomic_output(path):
+    """Yield a temporary file name next to *path* and move it into place
+    only once the caller has finished writing it. The temporary name ends in
+    .tmp<pid>, so files left by a crashed run never match the real extension
+    (numpy writers must be given an open file, or they append theirs)."""
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if op.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def parse_frame_slice(text):
+    """Parse a frame selection 'start:stop:step' (parts may be empty, a single
+    integer selects one frame) into a slice."""
+    parts = [int(part) if part.strip() else None for part in text.split(':')]
+    if len(parts) == 1:
+        start = parts[0]
+        if start is None:
+            return slice(None)
+        return slice(start, start + 1 if start != -1 else None)
+    return slice(*parts)
+
+
+def frame_sort_key(name):
+    """Sort key ordering frame file names by their embedded numbers
+    (dump.2.txt before dump.10.txt)."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+class NeighborWriter:
+    """Stream neighbor pairs chunk by chunk into the binary neighbor format.
+
+    The src column is written directly after the header while dst and weight
+    are spooled to temporary files next to *path* and appended on close, so
+    memory use is bounded by the size of one chunk.
+    """
+
+    def __init__(self, path, n_atoms, sorted_by_src=True):
+        self.path = path
+        self.n_atoms = n_atoms
+        self.sorted_by_src = sorted_by_src
+        self.n_pairs = 0
+        self._file = open(path, 'wb')
+        self._file.write(np.zeros(1, dtype=NEIGHBOR_HEADER).tobytes())
+        spool_dir = op.dirname(op.abspath(path))
+        self._spools = [tempfile.TemporaryFile(dir=spool_dir) for _ in NEIGHBOR_COLUMNS[1:]]
+
+    def write(self, src, dst, weight):
+        """Append one chunk of neighbor pairs."""
+        columns = (src, dst, weight)
+        outputs = (self._file, *self._spools)
+        for values, (_, dtype), f in zip(columns, NEIGHBOR_COLUMNS, outputs):
+            f.write(np.ascontiguousarray(values, dtype=dtype).data)
+        self.n_pairs += len(src)
+
+    def close(self):
+        """Append the spooled columns and fill in the header."""
+        for spool in self._spools:
+            spool.seek(0)
+            shutil.copyfileobj(spool, self._file, 1 << 24)
+            spool.close()
+        self._file.seek(0)
+        self._file.write(_neighbor_header(self.n_atoms, self.n_pairs, self.sorted_by_src))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in (self._file, *self._spools):
+                f.close()
+
+
+def read_neighbors(path):
+    """Memory-map a binary neighbor file.
+    Returns the header record and the src, dst and weight columns."""
+    header = np.fromfile(path, dtype=NEIGHBOR_HEADER, count=1)
+    if len(header) == 0 or header['magic'][0] != NEIGHBOR_MAGIC:
+        raise ValueError(f'{path} is not a GALAS binary neighbor file')
+    header = header[0]
+    return (header, *_map_neighbor_columns(path, int(header['n_pairs']), 'r'))
+
+
+def stitch_neighbors(path, parts, counts, block_size=1 << 22):
+    """Merge binary neighbor files into one file sorted by src.
+
+    Every atom's pairs must sit in exactly one of *parts*, grouped by src
+    (as written for the owned atoms of a spatial tile), and *counts* holds
+    the number of pairs of each atom. Each part is scattered into place
+    through a memory map, so memory use is bounded by *block_size* pairs
+    plus the per-atom offsets.
+    """
+    n_atoms = len(counts)
+    indptr = np.zeros(n_atoms + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    n_pairs = int(indptr[-1])
+    with open(path, 'wb') as f:
+        f.write(_neighbor_header(n_atoms, n_pairs, True))
+        f.truncate(NEIGHBOR_HEADER.itemsize + n_pairs * sum(np.dtype(d).itemsize for _, d in NEIGHBOR_COLUMNS))
+    if n_pairs == 0:
+        return
+    src_out, dst_out, weight_out = _map_neighbor_columns(path, n_pairs, 'r+')
+
+    # src is implied by the offsets; fill it a block of atoms at a time
+    atom_block = max(block_size // max(n_pairs // max(n_atoms, 1), 1), 1)
+    for start in range(0, n_atoms, atom_block):
+        stop = min(start + atom_block, n_atoms)
+        src_out[indptr[start]:indptr[stop]] = np.repeat(np.arange(start, stop, dtype=np.int32),
+                                                        counts[start:stop])
+
+    # Each pair goes to the offset of its src plus its rank within the group
+    for part in parts:
+        _, src, dst, weight = read_neighbors(part)
+        for start in range(0, len(src), block_size):
+            block_src = np.asarray(src[start:start + block_size])
+            group_start = np.searchsorted(src, block_src, side='left')
+            positions = indptr[block_src] + np.arange(start, start + len(block_src)) - group_start
+            dst_out[positions] = dst[start:start + block_size]
+            weight_out[positions] = weight[start:start + block_size]
+        del src, dst, weight
+    for column in (src_out, dst_out, weight_out):
+        column.flush()
+
+
+def _neighbor_header(n_atoms, n_pairs, sorted_by_src):
+    """Encode the header of a binary neighbor file."""
+    header = np.zeros(1, dtype=NEIGHBOR_HEADER)
+    header['magic'] = NEIGHBOR_MAGIC
+    header['version'] = NEIGHBOR_VERSION
+    header['sorted'] = int(sorted_by_src)
+    header['n_atoms'] = n_atoms
+    header['n_pairs'] = n_pairs
+    return header.tobytes()
+
+
+def _map_neighbor_columns(path, n_pairs, mode):
+    """Memory-map the src, dst and weight columns of a binary neighbor file."""
+    offset = NEIGHBOR_HEADER.itemsize
+    columns = []
+    for _, dtype in NEIGHBOR_COLUMNS:
+        if n_pairs > 0:
+            columns.append(np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=(n_pairs,)))
+        else:
+            columns.append(np.empty(0, dtype=dtype))
+        offset += n_pairs * np.dtype(dtype).itemsize
+    return columns
+
+
+def neighbors_to_csr(path):
+    """Build the half-symmetric (upper-triangle) CSR graph of a binary neighbor file.
+
+    Files sorted by src (as written by collect_neighbors.py) keep the pairs
+    with src < dst in order, so only indptr has to be computed. Unsorted
+    files fall back to a COO conversion.
+    """
+    header, src, dst, weight = read_neighbors(path)
+    n_atoms = int(header['n_atoms'])
+    if not header['sorted']:
+        return upper_triangle(coo_matrix((weight, (src, dst)), shape=(n_atoms, n_atoms)))
+    upper = src < dst
+    src, dst, weight = src[upper], dst[upper], weight[upper]
+    indptr = np.zeros(n_atoms + 1, dtype=_index_dtype(len(src)))
+    np.cumsum(np.bincount(src, minlength=n_atoms), out=indptr[1:])
+    return csr_matrix((weight, dst, indptr), shape=(n_atoms, n_atoms), copy=False)
+
+
+def _index_dtype(n_pairs):
+    """Smallest CSR index dtype able to address n_pairs entries."""
+    return np.int32 if n_pairs < np.iinfo(np.int32).max else np.int64
+
+
+# Graphs are stored as half-symmetric CSR: each undirected edge once, in the
+# upper triangle, with int32 indices and float32 weights
+def upper_triangle(A):
+    """Return the upper triangle (i < j) of a symmetric adjacency matrix as compact CSR."""
+    A = triu(A, k=1, format='csr')
+    index_dtype = _index_dtype(A.nnz)
+    return csr_matrix((A.data.astype(np.float32, copy=False),
+                       A.indices.astype(index_dtype, copy=False),
+                       A.indptr.astype(index_dtype, copy=False)), shape=A.shape, copy=False)
+
+
+def save_graph(path, A):
+    """Write a half-symmetric graph in the scipy .npz layout, so that
+    scipy.sparse.load_npz still reads it (as the upper triangle)."""
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, format=b'csr', shape=np.array(A.shape), data=A.data,
+                            indices=A.indices, indptr=A.indptr, symmetry=b'upper')
+
+
+def load_graph(path, symmetric=False):
+    """Read a graph written by save_graph as its upper triangle, or as the
+    full symmetric matrix if *symmetric*. Graphs stored with both directions
+    of every edge are converted."""
+    with np.load(path) as f:
+        A = csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+        half = 'symmetry' in f.files
+    if not half:
+        A = upper_triangle(A)
+    return symmetrize(A) if symmetric else A
+
+
+def symmetrize(A):
+    """Expand a half-symmetric graph to the full symmetric CSR matrix."""
+    return (A + A.T).tocsr()
+
+
+def graph_degrees(A):
+    """Node degrees and weighted degrees (summed edge weights) of a half-symmetric graph."""
+    n = A.shape[0]
+    degrees = np.diff(A.indptr) + np.bincount(A.indices, minlength=n)
+    weighted = (np.bincount(np.repeat(np.arange(n), np.diff(A.indptr)), weights=A.data, minlength=n) +
+                np.bincount(A.indices, weights=A.data, minlength=n))
+    return degrees, weighted
+
+
+def atom_table_path(path, frame, table_format='parquet'):
+    """Return the per-atom table file of *frame* (a dump name) in a given format."""
+    if table_format == 'csv':
+        return op.join(path, 'graphs', 'csvs', frame + '.csv')
+    return op.join(path, 'graphs', 'tables', f'{frame}.{table_format}')
+
+
+def find_atom_table(path, frame):
+    """Return the existing per-atom table of *frame*, preferring columnar formats."""
+    for table_format in ATOM_TABLE_FORMATS:
+        table_path = atom_table_path(path, frame, table_format)
+        if op.isfile(table_path):
+            return table_path
+    raise FileNotFoundError(f'no per-atom table found for {frame} in {path}')
+
+
+def downcast_atom_table(df):
+    """Cast per-atom columns to their compact storage dtypes."""
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        if column in ATOM_TABLE_DTYPES:
+            dtypes[column] = ATOM_TABLE_DTYPES[column]
+        elif dtype == np.float64:
+            dtypes[column] = np.float32
+    return df.astype(dtypes, copy=False)
+
+
+def read_atom_table(table_path, columns=None):
+    """Read a per-atom table, loading only *columns* if given."""
+    if table_path.endswith('.parquet'):
+        df = pd.read_parquet(table_path, columns=columns)
+    elif table_path.endswith('.feather'):
+        df = pd.read_feather(table_path, columns=columns)
+    else:
+        df = pd.read_csv(table_path, usecols=columns)
+    return downcast_atom_table(df)
+
+
+def write_atom_table(df, table_path):
+    """Atomically write a per-atom table in the format given by its extension."""
+    os.makedirs(op.dirname(table_path), exist_ok=True)
+    df = downcast_atom_table(df)
+    with atomic_output(table_path) as tmp_path:
+        if table_path.endswith('.parquet'):
+            df.to_parquet(tmp_path, index=False)
+        elif table_path.endswith('.feather'):
+            df.reset_index(drop=True).to_feather(tmp_path)
+        else:
+            df.to_csv(tmp_path, index=False)
+
+
+# Atom index: for every frame, the row of each atom identifier in its per-atom
+# table (-1 for identifiers not present), so that atoms can be looked up across
+# frames with a gather even if the dumps list them in different orders
+def atom_index_path(path, frame):
+    """Return the atom index file of *frame* (a dump name)."""
+    return op.join(path, 'graphs', 'index', frame + '.npy')
+
+
+def write_atom_index(path, frame, idx):
+    """Atomically write the identifier -> row index of a frame with identifiers *idx*."""
+    idx = np.asarray(idx, dtype=np.int64)
+    rows = np.full(int(idx.max(initial=-1)) + 1, -1, dtype=np.int32)
+    rows[idx] = np.arange(len(idx), dtype=np.int32)
+    index_path = atom_index_path(path, frame)
+    os.makedirs(op.dirname(index_path), exist_ok=True)
+    with atomic_output(index_path) as tmp_path, open(tmp_path, 'wb') as f:
+        np.save(f, rows)
+    return rows
+
+
+def load_atom_index(path, frame):
+    """Memory-map the atom index of a frame, building it from the idx column
+    of the per-atom table if it has not been written yet."""
+    index_path = atom_index_path(path, frame)
+    if not op.isfile(index_path):
+        idx = read_atom_table(find_atom_table(path, frame), columns=['idx'])['idx'].values
+        write_atom_index(path, frame, idx)
+    return np.load(index_path, mmap_mode='r')
+
+
+def atom_rows(index, ids):
+    """Rows of the atoms *ids* in the frame of *index*, -1 where absent."""
+    ids = np.asarray(ids, dtype=np.int64)
+    rows = np.full(len(ids), -1, dtype=np.int64)
+    known = (ids >= 0) & (ids < len(index))
+    rows[known] = index[ids[known]]
+    return rows
+
+
+# Simulation cell of every frame, in Ovito's convention: a 3x4 matrix whose
+# columns are the three cell vectors and the origin, and the periodic flags
+def cell_path(path, frame):
+    """Return the simulation cell file of *frame* (a dump name)."""
+    return op.join(path, 'graphs', 'cells', frame + '.npz')
+
+
+def write_cell(path, frame, matrix, pbc):
+    """Write the simulation cell of a frame."""
+    os.makedirs(op.dirname(cell_path(path, frame)), exist_ok=True)
+    with atomic_output(cell_path(path, frame)) as tmp_path, open(tmp_path, 'wb') as f:
+        np.savez(f, matrix=np.asarray(matrix, dtype=np.float64), pbc=np.asarray(pbc, dtype=bool))
+
+
+def read_cell(path, frame):
+    """Simulation cell (matrix, pbc) of a frame, from its cell file or else
+    the header of its LAMMPS dump. Returns None if neither is available."""
+    if op.isfile(cell_path(path, frame)):
+        with np.load(cell_path(path, frame)) as f:
+            return f['matrix'], f['pbc']
+    dump_path = op.join(path, 'dumps', frame)
+    if op.isfile(dump_path):
+        return read_dump_cell(dump_path)
+    return None
+
+
+def read_dump_cell(dump_path):
+    """Parse the (possibly triclinic) box of the first frame of a LAMMPS text dump."""
+    with (gzip.open(dump_path, 'rt') if dump_path.endswith('.gz') else open(dump_path)) as f:
+        for line in f:
+            if line.startswith('ITEM: BOX BOUNDS'):
+                flags = line.split()[3:]
+                bounds = np.array([[float(x) for x in next(f).split()] for _ in range(3)])
+                break
+            if line.startswith('ITEM: ATOMS'):
+                raise ValueError(f'no box bounds in {dump_path}')
+        else:
+            raise ValueError(f'no box bounds in {dump_path}')
+    pbc = np.array([flag == 'pp' for flag in flags[-3:]])
+    xy, xz, yz = bounds[:, 2] if bounds.shape[1] == 3 else (0.0, 0.0, 0.0)
+    xlo = bounds[0, 0] - min(0.0, xy, xz, xy + xz)
+    xhi = bounds[0, 1] - max(0.0, xy, xz, xy + xz)
+    ylo = bounds[1, 0] - min(0.0, yz)
+    yhi = bounds[1, 1] - max(0.0, yz)
+    zlo, zhi = bounds[2, :2]
+    matrix = np.array([[xhi - xlo, xy, xz, xlo],
+                       [0.0, yhi - ylo, yz, ylo],
+                       [0.0, 0.0, zhi - zlo, zlo]])
+    return matrix, pbc
+
+
+class Manifest:
+    """Record of the frames each pipeline stage has processed in a data folder.
+
+    For every frame and stage the manifest (manifest.json in the data folder)
+    keeps the fingerprints of the input files, the parameters used, the output
+    files and an optional result. An input is a file or, for one frame of a
+    multi-frame file, a (file, start, stop) byte range of it. A stage only has
+    to redo a frame if any of these changed or an output is missing. Entries
+    are saved every *save_every* changes or *save_interval* seconds, and on
+    exit, so an interrupted run resumes close to where it stopped.
+    """
+
+    def __init__(self, path, save_every=50, save_interval=60.0):
+        self.root = path
+        self.path = op.join(path, 'manifest.json')
+        self.frames = {}
+        self._hashes = {}
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self._pending = 0
+        self._saved_at = time.monotonic()
+        if op.isfile(self.path):
+            with open(self.path) as f:
+                self.frames = json.load(f).get('frames', {})
+        atexit.register(self.flush)
+
+    def fingerprint(self, file, digest=True):
+        """Size, modification time and (if *digest*) content hash of a file or
+        of a (file, start, stop) byte range."""
+        file, start, stop = _byte_range(file)
+        stat = os.stat(file)
+        stop = stat.st_size if stop is None else stop
+        fingerprint = {'size': stop - start, 'mtime': stat.st_mtime_ns}
+        if digest:
+            key = (op.abspath(file), start, stop, stat.st_size, stat.st_mtime_ns)
+            if key not in self._hashes:
+                h = hashlib.blake2b(digest_size=16)
+                with open(file, 'rb') as f:
+                    f.seek(start)
+                    remaining = stop - start
+                    for block in iter(lambda: f.read(min(1 << 24, remaining)), b''):
+                        h.update(block)
+                        remaining -= len(block)
+                self._hashes[key] = h.hexdigest()
+            fingerprint['hash'] = self._hashes[key]
+        return fingerprint
+
+    def is_fresh(self, frame, stage, inputs, params):
+        """Whether *stage* output for *frame* is up to date with the given
+        input files and parameters. Inputs whose size and mtime changed are
+        compared by content hash, so a touched but unchanged file (or a frame
+        of a trajectory that was appended to) is fresh."""
+        entry = self.frames.get(frame, {}).get(stage)
+        if entry is None or entry['params'] != _jsonable(params):
+            return False
+        if sorted(entry['inputs']) != sorted(self._relative(f) for f in inputs):
+            return False
+        if not all(op.isfile(op.join(self.root, f)) for f in entry['outputs']):
+            return False
+        for file in inputs:
+            recorded = entry['inputs'][self._relative(file)]
+            if not op.isfile(_byte_range(file)[0]):
+                return False
+            current = self.fingerprint(file, digest=False)
+            if current['size'] != recorded['size']:
+                return False
+            if current['mtime'] != recorded['mtime']:
+                if self.fingerprint(file)['hash'] != recorded['hash']:
+                    return False
+                # Unchanged content: remember the new mtime (saved with the next
+                # change or on exit) to skip hashing next time
+                recorded['mtime'] = current['mtime']
+                self._pending += 1
+        return True
+
+    def record(self, frame, stage, inputs, params, outputs, result=None):
+        """Record that *stage* processed *frame*."""
+        self.frames.setdefault(frame, {})[stage] = {
+            'inputs': {self._relative(f): self.fingerprint(f) for f in inputs},
+            'params': _jsonable(params),
+            'outputs': [self._relative(f) for f in outputs],
+            'result': result}
+        self._changed()
+
+    def discard(self, frame, stage):
+        """Forget *stage* output for *frame*, e.g. after it failed."""
+        if self.frames.get(frame, {}).pop(stage, None) is not None:
+            self._changed()
+
+    def result(self, frame, stage):
+        """Result recorded for *frame* by *stage*, or None."""
+        return self.frames.get(frame, {}).get(stage, {}).get('result')
+
+    def save(self):
+        with atomic_output(self.path) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                json.dump({'frames': self.frames}, f, indent=1, sort_keys=True)
+        self._pending = 0
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """Save the manifest if it changed since it was last saved."""
+        if self._pending:
+            self.save()
+
+    def _changed(self):
+        self._pending += 1
+        if self._pending >= self.save_every or time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def _relative(self, file):
+        file, start, stop = _byte_range(file)
+        if stop is None:
+            return op.relpath(file, self.root)
+        return f'{op.relpath(file, self.root)}[{start}:{stop}]'
+
+
+def _byte_range(file):
+    """(file, start, stop) of a manifest input; stop is None for a whole file."""
+    if isinstance(file, (tuple, list)):
+        return tuple(file)
+    return file, 0, None
+
+
+def dump_frame_ranges(file):
+    """Byte ranges (start, stop) of the timesteps of a multi-frame LAMMPS
+    text dump, in order, or None if the file has none (e.g. it is compressed)."""
+    if file.endswith('.gz') or os.stat(file).st_size == 0:
+        return None
+    with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        starts = []
+        start = data.find(b'ITEM: TIMESTEP')
+        while start >= 0:
+            starts.append(start)
+            start = data.find(b'ITEM: TIMESTEP', start + 1)
+        size = len(data)
+    if not starts:
+        return None
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _jsonable(params):
+    """Round-trip parameters through JSON so they compare equal to stored ones."""
+    return json.loads(json.dumps(params, sort_keys=True))
+
+
+class TrajectoryStore:
+    """Chunked (frame x atom) arrays of per-atom values over a trajectory.
+
+    The store lives in trajectory/ of the data folder. Every variable is split
+    into .npy chunk files of frame_chunk frames by atom_chunk atoms, indexed by
+    atom identifier, so that the same column is the same atom in every frame.
+    Frames are appended one at a time as they are processed; reading a few
+    atoms over all frames, or all atoms of one frame, only maps the chunks
+    that hold them. Frames are kept in time order (by frame_sort_key): a frame
+    earlier than stored ones is inserted, moving the rows after it. Missing
+    values are -1 (integers) or NaN (floats).
+    """
+
+    VARIABLES = {'n_neighbors': np.int16, 'summed_neighbor_distances': np.float32,
+                 'structure_type': np.int8, 'component': np.int32}
+
+    def __init__(self, path, frame_chunk=32, atom_chunk=1 << 16):
+        self.root = op.join(path, 'trajectory')
+        self.header_path = op.join(self.root, 'store.json')
+        if op.isfile(self.header_path):
+            with open(self.header_path) as f:
+                header = json.load(f)
+        else:
+            header = {'frames': [], 'n_atoms': 0, 'frame_chunk': frame_chunk, 'atom_chunk': atom_chunk}
+        self.frames = header['frames']
+        self.n_atoms = header['n_atoms']
+        self.frame_chunk = header['frame_chunk']
+        self.atom_chunk = header['atom_chunk']
+
+    def append(self, frame, ids, values):
+        """Write one frame (overwriting it if already stored). *ids* are the atom
+        identifiers and *values* maps variable names to per-atom arrays."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if frame not in self.frames:
+            keys = [frame_sort_key(f) for f in self.frames]
+            position = bisect.bisect_right(keys, frame_sort_key(frame))
+            self._shift(position)
+            self.frames.insert(position, frame)
+        position = self.frames.index(frame)
+        fi, row = divmod(position, self.frame_chunk)
+        self.n_atoms = max(self.n_atoms, int(ids.max(initial=-1)) + 1)
+        for name, dtype in self.VARIABLES.items():
+            dense = np.full(self.n_atoms, self._fill(dtype), dtype=dtype)
+            if name in values:
+                dense[ids] = values[name]
+            for ai in range(-(-self.n_atoms // self.atom_chunk)):
+                chunk = self._chunk(name, fi, ai, 'r+')
+                part = dense[ai * self.atom_chunk:(ai + 1) * self.atom_chunk]
+                chunk[row, :len(part)] = part
+                chunk.flush()
+        with atomic_output(self.header_path) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                json.dump({'frames': self.frames, 'n_atoms': self.n_atoms,
+                           'frame_chunk': self.frame_chunk, 'atom_chunk': self.atom_chunk}, f)
+
+    def read(self, name, frames=None, atoms=None):
+        """Values of variable *name* as a (frames x atoms) array. *frames* are
+        frame names or positions (default all) and *atoms* identifiers
+        (default all)."""
+        dtype = self.VARIABLES[name]
+        if frames is None:
+            frames = np.arange(len(self.frames))
+        else:
+            frames = np.array([self.frames.index(f) if isinstance(f, str) else f for f in frames], dtype=np.int64)
+        atoms = np.arange(self.n_atoms) if atoms is None else np.asarray(atoms, dtype=np.int64)
+        out = np.full((len(frames), len(atoms)), self._fill(dtype), dtype=dtype)
+        known = (atoms >= 0) & (atoms < self.n_atoms)
+        frame_chunks, frame_rows = np.divmod(frames, self.frame_chunk)
+        atom_chunks, atom_cols = np.divmod(atoms, self.atom_chunk)
+        for fi in np.unique(frame_chunks):
+            f_sel = np.flatnonzero(frame_chunks == fi)
+            for ai in np.unique(atom_chunks[known]):
+                a_sel = np.flatnonzero(known & (atom_chunks == ai))
+                chunk_path = self._chunk_path(name, fi, ai)
+                if op.isfile(chunk_path):
+                    chunk = np.load(chunk_path, mmap_mode='r')
+                    out[np.ix_(f_sel, a_sel)] = chunk[np.ix_(frame_rows[f_sel], atom_cols[a_sel])]
+        return out
+
+    def _shift(self, position):
+        """Move the rows of the stored frames from *position* on one row later."""
+        for name in self.VARIABLES:
+            for ai in range(-(-self.n_atoms // self.atom_chunk)):
+                chunks = {}
+                for k in range(len(self.frames) - 1, position - 1, -1):
+                    for fi in (k // self.frame_chunk, (k + 1) // self.frame_chunk):
+                        if fi not in chunks:
+                            chunks[fi] = self._chunk(name, fi, ai, 'r+')
+                    row = chunks[k // self.frame_chunk][k % self.frame_chunk]
+                    chunks[(k + 1) // self.frame_chunk][(k + 1) % self.frame_chunk] = row
+                for chunk in chunks.values():
+                    chunk.flush()
+
+    def _chunk_path(self, name, fi, ai):
+        return op.join(self.root, name, f'{fi}.{ai}.npy')
+
+    def _chunk(self, name, fi, ai, mode):
+        """Memory-map a chunk, creating it filled with missing values if needed."""
+        chunk_path = self._chunk_path(name, fi, ai)
+        if not op.isfile(chunk_path):
+            dtype = self.VARIABLES[name]
+            os.makedirs(op.dirname(chunk_path), exist_ok=True)
+            chunk = np.lib.format.open_memmap(chunk_path, mode='w+', dtype=dtype,
+                                              shape=(self.frame_chunk, self.atom_chunk))
+            chunk[:] = self._fill(dtype)
+            return chunk
+        return np.load(chunk_path, mmap_mode=mode)
+
+    @staticmethod
+    def _fill(dtype):
+        return np.nan if np.issubdtype(dtype, np.floating) else -1
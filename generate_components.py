@@ -21,63 +21,62 @@
 
 import os
 import os.path as op
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import numpy as np
 import pandas as pd
-from scipy.sparse import load_npz, save_npz
 from scipy.sparse.csgraph import connected_components
 import logging
 import argparse
-
-parser = argparse.ArgumentParser()
-parser.add_argument('--path', type=str, default='./data/', 
-                    help='Path to data folder')
-parser.add_argument('--ideal_neighbors', type=int, default=12,
-                    help='Ideal number of neighbors in unit cell -- default for FCC')
-args = parser.parse_args()
-
-# Collect all graphs
-data_path = op.join(args.path, 'graphs')
-all_frames = [f for f in os.listdir(data_path) if f.endswith('.npz')]
-logging.info(f'{len(all_frames)} to total frames in {data_path}')
-
-all_component_path = op.join(args.path, 'all_component_data.csv')
-with open(all_component_path, 'w') as f:
-    f.write("frame,nodes,edges,components,largest_grain\n")
-    
-# Read through graph files and generate components
-for frame in all_frames:
-    # Load sparse adjacency matrix
-    logging.info(f'Loading graph from {frame}')
+from galas_io import (atomic_output, frame_sort_key, Manifest, load_graph, save_graph, graph_degrees,
+                      atom_table_path, find_atom_table, read_atom_table)
+from defect_types import SIGNATURES, IDEAL_NEIGHBORS, load_signatures, classify_components
+
+
+def grouped_mean_std(labels, values, n_groups, ddof=0):
+    """Per-group mean and standard deviation of values keyed by integer labels.
+    Groups with no more than ddof members get a NaN std."""
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.bincount(labels, minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(labels, weights=values, minlength=n_groups)/counts
+        deviation = values - mean[labels]
+        var = np.bincount(labels, weights=deviation**2, minlength=n_groups)/(counts - ddof)
+    var[counts <= ddof] = np.nan
+    return mean, np.sqrt(var)
+
+
+def frame_inputs(frame, args):
+    """Graph and per-atom table of one frame (the table may be missing), and
+    the defect signature file if one is used."""
     try:
-        A = load_npz(op.join(data_path, frame))
-    except:
-        logging.warning('... graph could not be read')
-        continue
-        
-    n_nodes = A.shape[0]
-    n_edges = A.nnz // 2  # each edge stored in both directions
+        table_path = find_atom_table(args.path, frame.replace('.npz', ''))
+    except FileNotFoundError:
+        table_path = atom_table_path(args.path, frame.replace('.npz', ''))
+    inputs = [op.join(args.path, 'graphs', frame), table_path]
+    return inputs + [args.signatures] if args.signatures else inputs
+
+
+def frame_outputs(frame, args):
+    """Component graph, metadata and per-component csv of one frame."""
+    return [op.join(args.path, 'components', frame),
+            op.join(args.path, 'components', frame.replace('.npz', '.meta.npz')),
+            op.join(args.path, 'components', 'csvs', frame.replace('.npz', '.csv'))]
 
-    # Load graph data
-    info_path = op.join(data_path, 'csvs', frame.replace('.npz', '.csv'))
-    try:
-        df = pd.read_csv(info_path)
-    except:
-        logging.warning(f'... graph info could not be read from {info_path}')
-        continue
 
+def find_components(A, df, ideal_neighbors):
+    """Split the atoms with a non-ideal neighbor count into connected components.
+    Returns the defect subgraph, the defect atom indices, their component labels
+    (ordered by size, largest first) and the per-component statistics table."""
     # Identify defect atoms (non-ideal neighbor count)
-    defect_mask = df['n_neighbors'].values != args.ideal_neighbors
+    defect_mask = df['n_neighbors'].values != ideal_neighbors
     defect_indices = np.where(defect_mask)[0]
 
     # Extract defect subgraph (sparse submatrix)
-    A_defect = A[defect_indices][:, defect_indices]
+    A_defect = A[defect_indices][:, defect_indices].tocsr()
 
-    # Save defect subgraph as sparse matrix
-    component_path = op.join(args.path, 'components', frame)
-    save_npz(component_path, A_defect.tocsr())
-    logging.info(f'... component graph written to {component_path}')
-
-    # Find connected components using scipy (much faster than NetworkX)
+    # Find connected components using scipy (much faster than NetworkX);
+    # undirected traversal follows each stored edge both ways
     n_comp, labels = connected_components(A_defect, directed=False)
 
     # Sort components by size (largest first) and relabel
@@ -87,53 +86,25 @@ for frame in all_frames:
     label_map[sorted_comp_ids] = np.arange(n_comp)
     sorted_labels = label_map[labels]
 
-    # Save component metadata (defect indices and labels) for downstream use
-    meta_path = op.join(args.path, 'components', frame.replace('.npz', '.meta.npz'))
-    np.savez(meta_path, defect_indices=defect_indices, labels=sorted_labels)
-
-    # Collect info on each component
-    comp_ids, comp_nodes, comp_edges = [], [], []
-    deg_mean, deg_std, wdeg_mean, wdeg_std = [], [], [], []
-    full_deg_mean, full_deg_std, full_wdeg_mean, full_wdeg_std = [], [], [], []
-
-    # Precompute degree arrays for the defect subgraph
-    A_defect_csr = A_defect.tocsr()
-    sub_degrees = np.diff(A_defect_csr.indptr)
-    sub_weighted_degrees = np.asarray(A_defect_csr.sum(axis=1)).flatten()
-
-    for comp_id in range(n_comp):
-        # Get local indices within defect subgraph for this component
-        local_mask = sorted_labels == comp_id
-        local_indices = np.where(local_mask)[0]
-        original_indices = defect_indices[local_indices]
-
-        # Node and edge count for this component
-        comp_sub = A_defect_csr[local_indices][:, local_indices]
-        n_comp_nodes = len(local_indices)
-        n_comp_edges = comp_sub.nnz // 2
-
-        comp_ids.append(comp_id)
-        comp_nodes.append(n_comp_nodes)
-        comp_edges.append(n_comp_edges)
-
-        # Degree stats within the defect subgraph
-        comp_degrees = sub_degrees[local_indices]
-        deg_mean.append(comp_degrees.mean())
-        deg_std.append(comp_degrees.std())
-
-        # Weighted degree stats within the defect subgraph
-        comp_wdegrees = sub_weighted_degrees[local_indices]
-        wdeg_mean.append(comp_wdegrees.mean())
-        wdeg_std.append(comp_wdegrees.std())
-
-        # Stats from the full graph (stored in CSV)
-        full_deg_mean.append(df.iloc[original_indices]['summed_neighbor_distances'].mean())
-        full_deg_std.append(df.iloc[original_indices]['summed_neighbor_distances'].std())
-        full_wdeg_mean.append(df.iloc[original_indices]['n_neighbors'].mean())
-        full_wdeg_std.append(df.iloc[original_indices]['n_neighbors'].std())
+    # Collect info on each component in one grouped pass over the labels
+    sub_degrees, sub_weighted_degrees = graph_degrees(A_defect)
+    comp_ids = np.arange(n_comp)
+    comp_nodes = np.bincount(sorted_labels, minlength=n_comp)
+
+    # Every edge of the defect subgraph lies within the component of its source
+    edge_rows = np.repeat(np.arange(len(defect_indices)), np.diff(A_defect.indptr))
+    comp_edges = np.bincount(sorted_labels[edge_rows], minlength=n_comp)
+
+    # Degree and weighted degree stats within the defect subgraph
+    deg_mean, deg_std = grouped_mean_std(sorted_labels, sub_degrees, n_comp)
+    wdeg_mean, wdeg_std = grouped_mean_std(sorted_labels, sub_weighted_degrees, n_comp)
+
+    # Stats from the full graph (stored in the per-atom table), sample std as in pandas
+    full_deg_mean, full_deg_std = grouped_mean_std(
+        sorted_labels, df['summed_neighbor_distances'].values[defect_indices], n_comp, ddof=1)
+    full_wdeg_mean, full_wdeg_std = grouped_mean_std(
+        sorted_labels, df['n_neighbors'].values[defect_indices], n_comp, ddof=1)
 
-    # Write component info csv   
-    component_info_path = op.join(args.path, 'components', 'csvs', frame.replace('.npz', '.csv'))
     info = pd.DataFrame({
         'Component': comp_ids, 'Nodes': comp_nodes, 'Edges': comp_edges,
         'MeanDegree_sub': deg_mean, 'MeanDegree_sub_std': deg_std,
@@ -141,15 +112,116 @@ for frame in all_frames:
         'MeanDegree_full': full_deg_mean, 'MeanDegree_full_std': full_deg_std,
         'MeanWDegree_full': full_wdeg_mean, 'MeanWDegree_full_std': full_wdeg_std
     })
+    return A_defect, defect_indices, sorted_labels, info
+
+
+def summary_row(frame, A, info):
+    """Row of all_component_data.csv for one frame."""
+    largest = info['Nodes'].iloc[0] if len(info) else 0
+    return f"{frame},{A.shape[0]},{A.nnz},{len(info)},{largest}\n"
+
+
+def process_frame(frame, args, signatures):
+    """Extract the defect components of one graph, classify them with the
+    given defect signatures and write its component graph, metadata and
+    per-component csv. Returns the frame's row of all_component_data.csv, or
+    None if the frame could not be read."""
+    data_path = op.join(args.path, 'graphs')
+
+    # Load sparse adjacency matrix (upper triangle, each edge once)
+    logging.info(f'Loading graph from {frame}')
+    try:
+        A = load_graph(op.join(data_path, frame))
+    except:
+        logging.warning('... graph could not be read')
+        return None
+
+    # Load graph data (only the identifiers and neighbor columns are needed here)
+    try:
+        info_path = find_atom_table(args.path, frame.replace('.npz', ''))
+        df = read_atom_table(info_path, columns=['idx', 'n_neighbors', 'summed_neighbor_distances'])
+    except:
+        logging.warning(f'... graph info could not be read for {frame}')
+        return None
+
+    A_defect, defect_indices, labels, info = find_components(A, df, args.ideal_neighbors)
+    info['Type'] = classify_components(info, signatures)
+
+    # Save defect subgraph as sparse matrix
+    component_path, meta_path, component_info_path = frame_outputs(frame, args)
+    save_graph(component_path, A_defect)
+    logging.info(f'... component graph written to {component_path}')
+
+    # Save component metadata (defect indices, identifiers and labels) for downstream use
+    np.savez(meta_path, defect_indices=defect_indices, labels=labels,
+             defect_ids=df['idx'].values[defect_indices].astype(np.int64))
+
+    # Write component info csv   
     info.to_csv(component_info_path, index=False)
     logging.info(f'... detailed component graph info written to {component_info_path}')
 
-    # Write data for each component
-    largest = comp_nodes[0] if comp_nodes else 0
-    with open(all_component_path, 'a') as f:
-        f.write(f"{frame},{n_nodes},{n_edges},{n_comp},{largest}\n")
-    logging.info(f'... component info written to {all_component_path}')
+    return summary_row(frame, A, info)
 
-    # Free memory
-    del A, A_defect, A_defect_csr
 
+parser = argparse.ArgumentParser()
+parser.add_argument('--path', type=str, default='./data/', 
+                    help='Path to data folder')
+parser.add_argument('--ideal_neighbors', type=int, default=None,
+                    help='Ideal number of neighbors within the cutoff (default: 12 for FCC and HCP, 14 for BCC)')
+parser.add_argument('--lattice', type=str, default='FCC', choices=list(SIGNATURES),
+                    help='Lattice whose defect signatures classify the components')
+parser.add_argument('--signatures', type=str, default=None,
+                    help='JSON file of defect signatures {type: [nodes, edges]} replacing the built-in ones')
+parser.add_argument('--workers', type=int, default=1,
+                    help='Number of frames processed in parallel')
+parser.add_argument('--overwrite', action='store_true',
+                    help='Recompute frames that the manifest records as up to date')
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.ideal_neighbors is None:
+        args.ideal_neighbors = IDEAL_NEIGHBORS[args.lattice]
+
+    # Collect all graphs, in numeric frame order
+    data_path = op.join(args.path, 'graphs')
+    all_frames = sorted([f for f in os.listdir(data_path) if f.endswith('.npz')], key=frame_sort_key)
+    logging.info(f'{len(all_frames)} to total frames in {data_path}')
+
+    signatures = load_signatures(args.lattice, args.signatures)
+
+    # Skip frames whose components are up to date with their graph and table
+    manifest = Manifest(args.path)
+    params = {'ideal_neighbors': args.ideal_neighbors, 'lattice': args.lattice}
+    todo = [frame for frame in all_frames if args.overwrite or
+            not manifest.is_fresh(frame.replace('.npz', ''), 'generate_components',
+                                  frame_inputs(frame, args), params)]
+    logging.info(f'... skipping {len(all_frames) - len(todo)} up-to-date frames')
+
+    # Read through graph files and generate components; every frame writes
+    # only its own outputs, so frames can be processed in any order. The
+    # manifest records each frame (with its summary row) once it is done
+    def record(frame, row):
+        if row is None:
+            manifest.discard(frame.replace('.npz', ''), 'generate_components')
+        else:
+            manifest.record(frame.replace('.npz', ''), 'generate_components',
+                            frame_inputs(frame, args), params, frame_outputs(frame, args), row)
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(process_frame, frame, args, signatures): frame for frame in todo}
+            for future in as_completed(futures):
+                record(futures[future], future.result())
+    else:
+        for frame in todo:
+            record(frame, process_frame(frame, args, signatures))
+
+    # Write the summary of all frames at once, in frame order
+    rows = [manifest.result(frame.replace('.npz', ''), 'generate_components') for frame in all_frames]
+    all_component_path = op.join(args.path, 'all_component_data.csv')
+    with atomic_output(all_component_path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            f.write("frame,nodes,edges,components,largest_grain\n")
+            f.writelines(row for row in rows if row is not None)
+    logging.info(f'... component info written to {all_component_path}')
@@ -24,87 +24,154 @@ import os.path as op
 import gzip
 import numpy as np
 import pandas as pd
-from scipy.sparse import coo_matrix, save_npz
+from scipy.sparse import coo_matrix
 import logging
 import argparse
+from galas_io import (atomic_output, frame_sort_key, Manifest, neighbors_to_csr, upper_triangle,
+                      save_graph, symmetrize, graph_degrees, atom_table_path, find_atom_table,
+                      read_atom_table, write_atom_table)
+
+
+def count_triangles(A, block_size=1<<18):
+    """Per-row triangle counts diag(A^3)/2 of an undirected adjacency matrix.
+    Rows are processed in blocks to bound the size of the A @ A product."""
+    B = A.astype(np.int32)
+    B.data[:] = 1
+    triangles = np.zeros(B.shape[0], dtype=np.int32)
+    for start in range(0, B.shape[0], block_size):
+        rows = B[start:start + block_size]
+        paths = (rows @ B).multiply(rows)
+        triangles[start:start + block_size] = np.asarray(paths.sum(axis=1)).ravel() // 2
+    return triangles
+
+
+def segment_moments(indptr, values):
+    """Mean, std and (biased) skew of values over the CSR row segments in indptr,
+    matching np.mean, np.std and scipy.stats.skew; empty or constant rows give NaN."""
+    counts = np.diff(indptr)
+    rows = np.repeat(np.arange(len(counts)), counts)
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.bincount(rows, weights=values, minlength=len(counts))/counts
+        deviation = values - mean[rows]
+        m2 = np.bincount(rows, weights=deviation**2, minlength=len(counts))/counts
+        m3 = np.bincount(rows, weights=deviation**3, minlength=len(counts))/counts
+        skew = m3/m2**1.5
+    skew[m2 <= (np.finfo(np.float64).eps*mean)**2] = np.nan
+    return mean, np.sqrt(m2), skew
+
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--path', type=str, default='./data/', 
                     help='Path to data folder')
 parser.add_argument('--extra', action='store_true',
                     help='Compute extra graph properties')
+parser.add_argument('--overwrite', action='store_true',
+                    help='Recompute frames that the manifest records as up to date')
 args = parser.parse_args()
 
 # NOTE: code assumes neighbors folder is present and populated
 #       and file structure is in place
 
-# Collect all LAMMPS dumps
+# Collect all LAMMPS dumps; if a frame has both a binary and a text neighbor
+# file, the most recently written one is used
 data_path = op.join(args.path, 'neighbors')
-all_frames = [f.replace('.neighbors.txt.gz','') for f in os.listdir(data_path)]
+neighbor_files = {}
+for f in os.listdir(data_path):
+    for extension in ('.neighbors.txt.gz', '.neighbors.bin'):
+        if f.endswith(extension):
+            neighbor_files.setdefault(f[:-len(extension)], []).append(op.join('neighbors', f))
+for load_file, files in neighbor_files.items():
+    files.sort(key=lambda f: os.stat(op.join(args.path, f)).st_mtime_ns)
+    if len(files) > 1:
+        logging.warning(f'... {load_file} has neighbor files {" and ".join(files)}, using the newer {files[-1]}')
+    neighbor_files[load_file] = files[-1]
+all_frames = sorted(neighbor_files, key=frame_sort_key)
 logging.info(f'{len(all_frames)} to total frames in {data_path}')
 
+# Skip frames whose graph and table are up to date with their neighbor file
+# (the table is both read and rewritten, so it is fingerprinted after writing)
+def frame_inputs(load_file):
+    try:
+        table_file = find_atom_table(args.path, load_file)
+    except FileNotFoundError:
+        table_file = atom_table_path(args.path, load_file)
+    return [op.join(args.path, neighbor_files[load_file]), table_file]
+
+manifest = Manifest(args.path)
+params = {'extra': args.extra}
+if not args.overwrite:
+    todo = [f for f in all_frames if not manifest.is_fresh(f, 'make_graphs', frame_inputs(f), params)]
+    logging.info(f'... skipping {len(all_frames) - len(todo)} up-to-date frames')
+    all_frames = todo
+
 # Read through neighbor files and create graphs
 for load_file in all_frames:
     # Define file names
-    neighbor_file = op.join('neighbors', load_file + '.neighbors.txt.gz')
+    neighbor_file = neighbor_files[load_file]
     graph_file = op.join('graphs', load_file + '.npz')
-    csv_file = op.join('graphs/csvs', load_file + '.csv')
 
     logging.info(f'Creating graph from {neighbor_file}')
     
-    # Read in csv containing coordinate data
+    # Read in per-atom table containing coordinate data
     try:
-        df = pd.read_csv(op.join(args.path,csv_file))
+        table_file = find_atom_table(args.path, load_file)
+        df = read_atom_table(table_file)
     except:
         logging.warning('... coordinate data not found')
+        table_file = atom_table_path(args.path, load_file)
         df=pd.DataFrame()
        
     # Read edge list and build sparse adjacency matrix
     try:
-        edges = pd.read_csv(gzip.open(op.join(args.path, neighbor_file), "rb"),
-                            sep=' ', header=None, names=['src', 'dst', 'weight'])
-        n_atoms = len(df) if len(df) > 0 else int(edges[['src','dst']].max().max()) + 1
-        A = coo_matrix((edges['weight'].values, (edges['src'].values, edges['dst'].values)),
-                       shape=(n_atoms, n_atoms))
-        A_csr = A.tocsr()
-        save_npz(op.join(args.path, graph_file), A_csr)
+        if neighbor_file.endswith('.neighbors.bin'):
+            # Pairs are already sorted by src, so the upper triangle is a filter
+            A_csr = neighbors_to_csr(op.join(args.path, neighbor_file))
+        else:
+            edges = pd.read_csv(gzip.open(op.join(args.path, neighbor_file), "rb"),
+                                sep=' ', header=None, names=['src', 'dst', 'weight'])
+            n_atoms = len(df) if len(df) > 0 else int(edges[['src','dst']].max().max()) + 1
+            A = coo_matrix((edges['weight'].values, (edges['src'].values, edges['dst'].values)),
+                           shape=(n_atoms, n_atoms))
+            A_csr = upper_triangle(A)
+            del A, edges
+        # Each edge is stored once (upper triangle)
+        with atomic_output(op.join(args.path, graph_file)) as tmp_file:
+            save_graph(tmp_file, A_csr)
         logging.info(f'... sparse matrix stored at {graph_file}')
     except:
         logging.warning(f'... failed to read {neighbor_file}')
+        manifest.discard(load_file, 'make_graphs')
         continue
 
-    # Write neighbor info to csv
-    df['n_neighbors'] = np.diff(A_csr.indptr)
-    df['summed_neighbor_distances'] = np.asarray(A_csr.sum(axis=1)).flatten()
+    # Write neighbor info to the per-atom table
+    df['n_neighbors'], df['summed_neighbor_distances'] = graph_degrees(A_csr)
     df['norm_distances'] = df['summed_neighbor_distances']/df['n_neighbors']
     
     # Optional computation of additional graph properties
     if args.extra:
-        import networkx as nx
-        from scipy.stats import skew
-        G = nx.from_scipy_sparse_array(A_csr)
+        logging.info('... computing extra graph properties')
+        A_extra = symmetrize(A_csr)
+        A_extra.sum_duplicates()
 
         # Compute number of triangles for each atom
-        df['triangles']=df['idx'].apply(lambda x: nx.triangles(G, x))
+        df['triangles'] = count_triangles(A_extra)
 
         # Compute stats for neighbor distance (graph edge weight)
-        weights = [[x[1]['weight'] for x in G[comp].items()] 
-                   for comp in df['idx'].sort_values().tolist()]
-        df['weight_mean']=df['idx'].apply(lambda x: np.array(weights[x]).mean()) 
-        df['weight_std']=df['idx'].apply(lambda x: np.array(weights[x]).std())
-        df['weight_skew']=df['idx'].apply(lambda x: skew(weights[x]))
+        df['weight_mean'], df['weight_std'], df['weight_skew'] = \
+            segment_moments(A_extra.indptr, A_extra.data)
 
         # Compute stats for number of neighbors (graph node degree)
-        degrees = [[G.degree[node] for node in [x for x in G.neighbors(comp)]] 
-                   for comp in df['idx'].sort_values().tolist()]
-        df['neighbor_degree_mean']=df['idx'].apply(lambda x: np.array(degrees[x]).mean())
-        df['neighbor_degree_std']=df['idx'].apply(lambda x: np.array(degrees[x]).std())
-        df['neighbor_degree_skew']=df['idx'].apply(lambda x: skew(degrees[x]))
+        degree = np.diff(A_extra.indptr)
+        df['neighbor_degree_mean'], df['neighbor_degree_std'], df['neighbor_degree_skew'] = \
+            segment_moments(A_extra.indptr, degree[A_extra.indices])
 
-        G.clear()
+        del A_extra, degree
     
-    df.to_csv(op.join(args.path, csv_file), index=False)
-    logging.info(f'... info written to {csv_file}')
+    write_atom_table(df, table_file)
+    logging.info(f'... info written to {table_file}')
+    manifest.record(load_file, 'make_graphs', frame_inputs(load_file), params,
+                    [op.join(args.path, graph_file), table_file])
 
     # Free memory
-    del A, A_csr
+    del A_csr
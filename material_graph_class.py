@@ -22,6 +22,7 @@
 import os
 import os.path as op
 import gzip
+import itertools
 from ovito.io import import_file
 from ovito.data import CutoffNeighborFinder
 from ovito.modifiers import SelectTypeModifier, DeleteSelectedModifier, PolyhedralTemplateMatchingModifier, CommonNeighborAnalysisModifier
@@ -31,6 +32,92 @@ import logging
 import tqdm
 
 
+# Nearest-neighbor vectors of the FCC lattice, in units of half the lattice constant
+FCC_NEIGHBORS = np.array([v for v in itertools.product((-1, 0, 1), repeat=3) if np.abs(v).sum() == 2])
+
+# Vacancy clusters of the built-in FCC templates, as sites in units of half
+# the lattice constant; the adjacent mono-vacancies are pairs of vacancies at
+# second, third and fourth neighbor distance
+FCC_VACANCY_CLUSTERS = {
+    'Mono-vacancy': [(0, 0, 0)],
+    'Di-vacancy': [(0, 0, 0), (1, 1, 0)],
+    'Tri-vacancy (triangular)': [(0, 0, 0), (1, 1, 0), (1, 0, 1)],
+    'Tri-vacancy (right angle)': [(0, 0, 0), (1, 1, 0), (1, -1, 0)],
+    'Tri-vacancy (bent)': [(0, 0, 0), (1, 1, 0), (-1, 0, 1)],
+    'Tri-vacancy (linear)': [(0, 0, 0), (1, 1, 0), (-1, -1, 0)],
+    'Adjacent mono-vac (square face, 4 shared)': [(0, 0, 0), (2, 0, 0)],
+    'Adjacent mono-vac (face edge, 2 shared)': [(0, 0, 0), (2, 1, 1)],
+    'Adjacent mono-vac (face corner, 1 shared)': [(0, 0, 0), (2, 2, 0)],
+}
+
+
+def fcc_vacancy_graph(vacancies):
+    """Defect graph of a vacancy cluster in an ideal FCC lattice: the atoms
+    that lost a nearest neighbor, connected to their nearest neighbors among
+    them (a cutoff between the first and second neighbor shells)."""
+    vacancies = {tuple(v) for v in vacancies}
+    defect = {tuple(np.add(v, d)) for v in vacancies for d in FCC_NEIGHBORS} - vacancies
+    G = nx.Graph()
+    G.add_nodes_from(defect)
+    G.add_edges_from((u, tuple(np.add(u, d))) for u in defect for d in FCC_NEIGHBORS
+                     if tuple(np.add(u, d)) in defect)
+    return G
+
+
+class TemplateLibrary:
+    """Defect template graphs indexed by a cheap isomorphism invariant.
+
+    A component is first screened by its node and edge counts, then looked up
+    by its sorted degree sequence, sorted triangle counts and Weisfeiler-Lehman
+    hash. These invariants only rule templates out: graphs with different
+    keys cannot be isomorphic, but graphs with the same key can differ (e.g.
+    regular graphs such as the cuboctahedron and anticuboctahedron), so every
+    template sharing the key is confirmed with a full VF2 isomorphism test."""
+
+    def __init__(self):
+        self.templates = {}
+        self._index = {}
+        self._sizes = set()
+
+    @staticmethod
+    def invariant_key(G):
+        """Isomorphism-invariant key of a graph."""
+        degrees = tuple(sorted(d for _, d in G.degree()))
+        triangles = tuple(sorted(nx.triangles(G).values()))
+        return (G.number_of_nodes(), G.number_of_edges(), degrees, triangles,
+                nx.weisfeiler_lehman_graph_hash(G, iterations=3))
+
+    def add(self, name, G):
+        """Add (or replace) a template graph."""
+        if name in self.templates:
+            self._index[self.invariant_key(self.templates[name])].remove(name)
+        G = nx.Graph(G.edges())
+        self.templates[name] = G
+        self._index.setdefault(self.invariant_key(G), []).append(name)
+        self._sizes = {(T.number_of_nodes(), T.number_of_edges()) for T in self.templates.values()}
+
+    def add_edgelist(self, name, path):
+        """Add a template read from an edgelist file (e.g. a component of a
+        relaxed structure)."""
+        self.add(name, nx.read_edgelist(path))
+
+    def match(self, G):
+        """Name of the template isomorphic to G, or None."""
+        if (G.number_of_nodes(), G.number_of_edges()) not in self._sizes:
+            return None
+        candidates = self._index.get(self.invariant_key(G), [])
+        return next((name for name in candidates if nx.vf2pp_is_isomorphic(self.templates[name], G)), None)
+
+    @classmethod
+    def fcc(cls):
+        """Templates of mono-, di- and tri-vacancies and adjacent mono-vacancies
+        in an ideal FCC lattice."""
+        library = cls()
+        for name, vacancies in FCC_VACANCY_CLUSTERS.items():
+            library.add(name, fcc_vacancy_graph(vacancies))
+        return library
+
+
 class MaterialGraph:
     
     def __init__(self, input, output, 
@@ -78,7 +165,7 @@ class MaterialGraph:
         """
         if method == 'PTM':
             assignment_mod = PolyhedralTemplateMatchingModifier()
-            self.remove_type = ovito_PTM_structure[nondefect.upper()]
+            remove_type = self.ovito_PTM_structure[nondefect.upper()]
         elif method == 'CNA':
             #FixedCutoff              
             assignment_mod = CommonNeighborAnalysisModifier(mode=CommonNeighborAnalysisModifier.Mode.FixedCutoff,
@@ -132,15 +219,24 @@ class MaterialGraph:
         self.C_k_sizes = np.array([len(c) for c in self.C_k])
 
         
-    def monovacancy_check(self):
+    def template_check(self, library=None):
+        """Match every in-grain component against a template library (the
+        ideal FCC vacancy clusters by default). Sets self.C_k_types, the
+        template name of each component or None."""
+        self.library = library if library is not None else TemplateLibrary.fcc()
+        self.C_k_types = [self.library.match(self.G.subgraph(c)) for c in self.C_k]
+
+
+    def monovacancy_check(self, template=None):
         # check all components with 12 vertices for isomorphic match with template vacancy
         
-        # read in template vacancy
-        V = nx.read_edgelist("data/monovacancy.edgelist.txt.gz")
+        # template vacancy from an edgelist file, or the ideal FCC mono-vacancy
+        library = TemplateLibrary.fcc()
+        if template is not None:
+            library.add_edgelist('Mono-vacancy', template)
         
         self.confirmed_monovac=[]
         for i in np.where(self.C_k_sizes==12)[0]:
             Ck = self.G.subgraph(self.C_k[i])
-            if nx.faster_could_be_isomorphic(V, Ck):
-                if nx.is_isomorphic(V, Ck):
-                    self.confirmed_monovac+=i
\ No newline at end of file
+            if library.match(Ck) == 'Mono-vacancy':
+                self.confirmed_monovac.append(i)
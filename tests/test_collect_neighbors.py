@@ -0,0 +1,78 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+
+import argparse
+import numpy as np
+import pytest
+from ovito.data import DataCollection, SimulationCell, CutoffNeighborFinder
+from ovito.modifiers import PolyhedralTemplateMatchingModifier
+from collect_neighbors import (neighbor_cutoff, voronoi_modifier, iter_neighbor_chunks, atomic_volumes,
+                               collect_tiles)
+
+LATTICE_CONSTANT = 4.0559
+
+
+def defected_frame(n=10, seed=0):
+    """Periodic FCC frame of n^3 unit cells with thermal noise, scattered
+    vacancies and a void."""
+    rng = np.random.default_rng(seed)
+    basis = np.array([(0, 0, 0), (0.5, 0.5, 0), (0.5, 0, 0.5), (0, 0.5, 0.5)])
+    offsets = np.stack(np.meshgrid(*[np.arange(n)] * 3, indexing='ij'), axis=-1).reshape(-1, 1, 3)
+    positions = ((offsets + basis) * LATTICE_CONSTANT).reshape(-1, 3)
+    keep = np.ones(len(positions), dtype=bool)
+    keep[rng.choice(len(positions), 30, replace=False)] = False
+    keep[np.linalg.norm(positions - n * LATTICE_CONSTANT / 2, axis=1) < 0.9 * LATTICE_CONSTANT] = False
+    positions = positions[keep] + rng.normal(0, 0.08, (keep.sum(), 3))
+
+    data = DataCollection()
+    cell = SimulationCell(pbc=(True, True, True))
+    cell[...] = np.column_stack([n * LATTICE_CONSTANT * np.eye(3), np.zeros(3)])
+    data.objects.append(cell)
+    particles = data.create_particles(count=len(positions))
+    particles.create_property('Position', data=positions)
+    particles.create_property('Particle Identifier', data=np.arange(1, len(positions) + 1))
+    particles.create_property('Particle Type', data=np.ones(len(positions), dtype=int))
+    return data
+
+
+@pytest.mark.parametrize('voronoi', ['all', 'defects'])
+def test_tiles_match_untiled_frame(tmp_path, voronoi):
+    args = argparse.Namespace(max_tile_atoms=500, voronoi=voronoi, chunk_size=0,
+                              ideal_neighbors=12, lattice='FCC')
+    cutoff = neighbor_cutoff(LATTICE_CONSTANT)
+
+    data = defected_frame()
+    data.apply(PolyhedralTemplateMatchingModifier())
+    if voronoi == 'all':
+        data.apply(voronoi_modifier())
+    finder = CutoffNeighborFinder(cutoff, data)
+    n_neighbors = np.zeros(data.particles.count, dtype=np.int32)
+    for _ in iter_neighbor_chunks(finder, range(data.particles.count), 0, n_neighbors):
+        pass
+    volumes = atomic_volumes(data, finder, n_neighbors, args)
+
+    structure_type, tiled_volumes, tiled_neighbors = collect_tiles(
+        defected_frame(), cutoff, str(tmp_path / 'frame.neighbors.bin'), args)
+    assert (tiled_neighbors == n_neighbors).all()
+    assert (structure_type == np.asarray(data.particles['Structure Type'])).all()
+    np.testing.assert_allclose(tiled_volumes, volumes, rtol=1e-5, equal_nan=True)
+    assert np.isfinite(volumes).sum() > 0
@@ -0,0 +1,48 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+
+import numpy as np
+from defect_ordering import compute_structure_factor
+
+
+def cubic_cell(length):
+    """Periodic cubic cell in Ovito's 3x4 form (cell vectors and origin)."""
+    return np.column_stack([length * np.eye(3), np.zeros(3)]), np.ones(3, dtype=bool)
+
+
+def test_random_points_have_no_structure():
+    rng = np.random.default_rng(0)
+    cell, pbc = cubic_cell(100.0)
+    S_q, q = compute_structure_factor(rng.uniform(0, 100.0, (2000, 3)), 2.0, 100, cell, pbc, 50.0)
+    # no forward scattering from the finite sample, and no peaks
+    assert np.abs(S_q[q > 0.5] - 1).max() < 0.2
+
+
+def test_simple_cubic_peak():
+    spacing = 10.0
+    sites = np.stack(np.meshgrid(*[np.arange(10)] * 3, indexing='ij'), axis=-1).reshape(-1, 3) * spacing
+    cell, pbc = cubic_cell(10 * spacing)
+    S_q, q = compute_structure_factor(sites, 1.0, 400, cell, pbc, 1000.0)
+    # first Bragg peak, from the cutoff capped at half the cell width
+    first = q < 0.75
+    assert abs(q[first][S_q[first].argmax()] - 2 * np.pi / spacing) < 0.02
+    assert S_q[first].max() > 2
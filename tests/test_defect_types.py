@@ -0,0 +1,127 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.spatial import cKDTree
+from defect_types import SIGNATURES, CUTOFF_SHELLS, IDEAL_NEIGHBORS, GBS, UNCLASSIFIED, load_signatures, classify_components
+
+
+def lattice(basis, cell, n=5):
+    """Sites of an n x n x n periodic supercell and its box lengths."""
+    cell = np.asarray(cell, dtype=float)
+    offsets = np.stack(np.meshgrid(*[np.arange(n)] * 3, indexing='ij'), axis=-1).reshape(-1, 1, 3)
+    return ((offsets + np.asarray(basis)) * cell).reshape(-1, 3), n * cell
+
+
+def vacancy_signature(basis, cell, cutoff, vacancies):
+    """(Nodes, Edges) of the defect component left by removing the sites at
+    the given positions: atoms off their ideal neighbor count, connected to
+    their defect neighbors."""
+    positions, box = lattice(basis, cell)
+    tree = cKDTree(positions, boxsize=box)
+    first = positions[::len(basis)]
+    center = first[np.linalg.norm(first - box / 2, axis=1).argmin()]
+    distance, removed = tree.query((np.asarray(vacancies) + center) % box)
+    assert np.allclose(distance, 0)
+    positions = np.delete(positions, removed, axis=0)
+    pairs = cKDTree(positions, boxsize=box).query_pairs(cutoff, output_type='ndarray')
+    degree = np.bincount(pairs.ravel(), minlength=len(positions))
+    defect = degree != np.bincount(degree).argmax()
+    return int(defect.sum()), int(defect[pairs].all(axis=1).sum())
+
+
+FCC = [(0, 0, 0), (0.5, 0.5, 0), (0.5, 0, 0.5), (0, 0.5, 0.5)]
+BCC = [(0, 0, 0), (0.5, 0.5, 0.5)]
+HCP = [(0, 0, 0), (0.5, 0.5, 0), (0.5, 5 / 6, 0.5), (0, 1 / 3, 0.5)]
+HCP_CELL = (1, np.sqrt(3), np.sqrt(8 / 3))
+
+
+@pytest.mark.parametrize('lattice_name, basis, cell, name, vacancies', [
+    ('FCC', FCC, (1, 1, 1), 'Mono-vacancy', [(0, 0, 0)]),
+    ('FCC', FCC, (1, 1, 1), 'Di-vacancy', [(0, 0, 0), (0.5, 0.5, 0)]),
+    ('BCC', BCC, (1, 1, 1), 'Mono-vacancy', [(0, 0, 0)]),
+    ('BCC', BCC, (1, 1, 1), 'Di-vacancy (1st neighbors)', [(0, 0, 0), (0.5, 0.5, 0.5)]),
+    ('BCC', BCC, (1, 1, 1), 'Di-vacancy (2nd neighbors)', [(0, 0, 0), (1, 0, 0)]),
+    ('HCP', HCP, HCP_CELL, 'Mono-vacancy', [(0, 0, 0)]),
+    ('HCP', HCP, HCP_CELL, 'Di-vacancy', [(0, 0, 0), (1, 0, 0)]),
+    ('HCP', HCP, HCP_CELL, 'Di-vacancy', [(0, 0, 0), (0, np.sqrt(3) / 3, np.sqrt(2 / 3))]),
+])
+def test_signatures_of_ideal_lattices(lattice_name, basis, cell, name, vacancies):
+    cutoff = np.mean(CUTOFF_SHELLS[lattice_name])
+    assert vacancy_signature(basis, cell, cutoff, vacancies) == SIGNATURES[lattice_name][name]
+
+
+@pytest.mark.parametrize('lattice_name, basis, cell', [
+    ('FCC', FCC, (1, 1, 1)), ('BCC', BCC, (1, 1, 1)), ('HCP', HCP, HCP_CELL)])
+def test_cutoff_counts_ideal_neighbors(lattice_name, basis, cell):
+    positions, box = lattice(basis, cell)
+    tree = cKDTree(positions, boxsize=box)
+    inner, outer = CUTOFF_SHELLS[lattice_name]
+    for cutoff in (1.01*inner, np.mean(CUTOFF_SHELLS[lattice_name]), 0.99*outer):
+        counts = np.array([len(n) - 1 for n in tree.query_ball_point(positions, cutoff)])
+        assert (counts == IDEAL_NEIGHBORS[lattice_name]).all()
+
+
+def component_table(signatures):
+    return pd.DataFrame({'Component': np.arange(len(signatures)),
+                         'Nodes': [n for n, _ in signatures],
+                         'Edges': [e for _, e in signatures]})
+
+
+def test_exact_signatures_take_precedence_over_node_only():
+    signatures = {'Exact': (20, 44), 'Any edges': (20, None), 'Other': (12, 24)}
+    info = component_table([(500, 900), (20, 44), (20, 45), (12, 24), (12, 25)])
+    types = classify_components(info, signatures)
+    assert list(types) == [GBS, 'Exact', 'Any edges', 'Other', UNCLASSIFIED]
+
+
+def test_builtin_signatures_classify():
+    info = component_table([(500, 900), (12, 24), (18, 40), (21, 47), (7, 9)])
+    types = classify_components(info, load_signatures('FCC'), gbs=False)
+    assert list(types) == [UNCLASSIFIED, 'Mono-vacancy', 'Di-vacancy',
+                           'Adjacent mono-vac (triangle face, 3 shared)', UNCLASSIFIED]
+
+
+def test_load_signatures_nested_by_lattice(tmp_path):
+    path = tmp_path / 'signatures.json'
+    path.write_text(json.dumps({'BCC': {'Mono-vacancy': [14, 36], 'Cluster': [30, None]}}))
+    assert load_signatures('bcc', str(path)) == {'Mono-vacancy': (14, 36), 'Cluster': (30, None)}
+
+
+@pytest.mark.parametrize('config', [
+    {'A': [12, 24], 'B': [12, 24]},
+    {'A': [20, None], 'B': [20, None]},
+])
+def test_duplicate_signatures_are_rejected(tmp_path, config):
+    path = tmp_path / 'signatures.json'
+    path.write_text(json.dumps(config))
+    with pytest.raises(ValueError, match="'A' and 'B'"):
+        load_signatures('FCC', str(path))
+
+
+def test_same_nodes_with_and_without_edges_are_allowed(tmp_path):
+    path = tmp_path / 'signatures.json'
+    path.write_text(json.dumps({'A': [20, 44], 'B': [20, None]}))
+    assert load_signatures('FCC', str(path)) == {'A': (20, 44), 'B': (20, None)}
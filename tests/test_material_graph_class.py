@@ -0,0 +1,100 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+
+import random
+import networkx as nx
+import numpy as np
+import pytest
+from material_graph_class import TemplateLibrary, FCC_VACANCY_CLUSTERS, fcc_vacancy_graph
+
+
+def vacancy_shell(above, below):
+    """First neighbor shell around a vacancy in a close-packed lattice, with
+    unit spacing: six atoms in its plane and three above and below it at the
+    given azimuths (degrees). Atoms at unit distance are connected."""
+    angles = np.radians(np.arange(0, 360, 60))
+    sites = [(np.cos(a), np.sin(a), 0) for a in angles]
+    for height, azimuths in ((np.sqrt(2 / 3), above), (-np.sqrt(2 / 3), below)):
+        sites += [(np.cos(a) / np.sqrt(3), np.sin(a) / np.sqrt(3), height) for a in np.radians(azimuths)]
+    sites = np.array(sites)
+    distance = np.linalg.norm(sites[:, None] - sites[None], axis=-1)
+    return nx.Graph([(i, j) for i, j in zip(*np.nonzero(np.isclose(distance, 1))) if i < j])
+
+
+# Cuboctahedron (FCC site, ABC stacking) and anticuboctahedron (HCP site or
+# stacking fault, ABA stacking)
+CUBOCTAHEDRON = vacancy_shell((30, 150, 270), (90, 210, 330))
+ANTICUBOCTAHEDRON = vacancy_shell((30, 150, 270), (30, 150, 270))
+
+
+def shuffled(G):
+    nodes = list(G)
+    random.Random(0).shuffle(nodes)
+    return nx.relabel_nodes(G, {u: k for k, u in enumerate(nodes)})
+
+
+def test_fcc_templates_are_distinct():
+    templates = TemplateLibrary.fcc().templates
+    names = list(templates)
+    for k, a in enumerate(names):
+        for b in names[k + 1:]:
+            assert not nx.is_isomorphic(templates[a], templates[b]), (a, b)
+
+
+@pytest.mark.parametrize('name', list(FCC_VACANCY_CLUSTERS))
+def test_relabeled_templates_match(name):
+    library = TemplateLibrary.fcc()
+    assert library.match(shuffled(fcc_vacancy_graph(FCC_VACANCY_CLUSTERS[name]))) == name
+
+
+def test_mono_vacancy_is_the_cuboctahedron():
+    library = TemplateLibrary.fcc()
+    assert nx.is_isomorphic(CUBOCTAHEDRON, library.templates['Mono-vacancy'])
+    assert library.match(shuffled(CUBOCTAHEDRON)) == 'Mono-vacancy'
+
+
+def test_anticuboctahedron_is_not_a_mono_vacancy():
+    library = TemplateLibrary.fcc()
+    # Same sizes, degrees, triangles and WL hash, but not isomorphic
+    assert TemplateLibrary.invariant_key(ANTICUBOCTAHEDRON) == TemplateLibrary.invariant_key(CUBOCTAHEDRON)
+    assert not nx.is_isomorphic(ANTICUBOCTAHEDRON, CUBOCTAHEDRON)
+    assert library.match(ANTICUBOCTAHEDRON) is None
+    # Repeated lookups of the same key give the right answer either way
+    assert library.match(shuffled(CUBOCTAHEDRON)) == 'Mono-vacancy'
+    assert library.match(ANTICUBOCTAHEDRON) is None
+
+
+def test_same_key_templates_are_told_apart():
+    library = TemplateLibrary()
+    library.add('FCC mono-vacancy', CUBOCTAHEDRON)
+    library.add('HCP mono-vacancy', ANTICUBOCTAHEDRON)
+    assert library.match(shuffled(ANTICUBOCTAHEDRON)) == 'HCP mono-vacancy'
+    assert library.match(shuffled(CUBOCTAHEDRON)) == 'FCC mono-vacancy'
+
+
+def test_replaced_template(tmp_path):
+    library = TemplateLibrary.fcc()
+    path = tmp_path / 'template.edgelist'
+    nx.write_edgelist(ANTICUBOCTAHEDRON, path, data=False)
+    library.add_edgelist('Mono-vacancy', str(path))
+    assert library.match(CUBOCTAHEDRON) is None
+    assert library.match(shuffled(ANTICUBOCTAHEDRON)) == 'Mono-vacancy'
@@ -0,0 +1,157 @@
+# This material was prepared as an account of work sponsored by an agency of the 
+# United States Government. Neither the United States Government nor the United 
+# States Department of Energy, nor Battelle, nor any of their employees, nor any 
+# jurisdiction or organization that has cooperated in the development of these 
+# materials, makes any warranty, express or implied, or assumes any legal 
+# liability or responsibility for the accuracy, completeness, or usefulness or 
+# any information, apparatus, product, software, or process disclosed, or 
+# represents that its use would not infringe privately owned rights. Reference 
+# herein to any specific commercial product, process, or service by trade name, 
+# trademark, manufacturer, or otherwise does not necessarily constitute or imply 
+# its endorsement, recommendation, or favoring by the United States Government 
+# or any agency thereof, or Battelle Memorial Institute. The views and opinions 
+# of authors expressed herein do not necessarily state or reflect those of the 
+# United States Government or any agency thereof.
+#                    PACIFIC NORTHWEST NATIONAL LABORATORY
+#                               operated by
+#                                BATTELLE
+#                                for the
+#                      UNITED STATES DEPARTMENT OF ENERGY
+#                       under Contract DE-AC05-76RL01830
+
+
+import os
+import os.path as op
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+import logging
+import argparse
+from galas_io import atomic_output, frame_sort_key, find_atom_table, read_atom_table
+
+parser = argparse.ArgumentParser(description='Track defect components between consecutive frames by atom overlap')
+parser.add_argument('--path', type=str, default='./data/', 
+                    help='Path to data folder')
+parser.add_argument('--table_format', type=str, default='parquet', choices=['parquet', 'csv'],
+                    help='Storage format of the event table')
+
+# Transition events between the components of consecutive frames
+EVENTS = ['persist', 'migrate', 'merge', 'split', 'birth', 'death']
+PERSIST, MIGRATE, MERGE, SPLIT, BIRTH, DEATH = range(len(EVENTS))
+
+
+def load_components(path, frame):
+    """Atom identifiers and component labels of the defect atoms of one frame,
+    from components/<frame>.meta.npz (or, for metadata written without the
+    identifiers, the idx column of its per-atom table)."""
+    meta = np.load(op.join(path, 'components', frame + '.meta.npz'))
+    defect_indices, labels = meta['defect_indices'], meta['labels']
+    if 'defect_ids' in meta.files:
+        return meta['defect_ids'].astype(np.int64), labels
+    try:
+        idx = read_atom_table(find_atom_table(path, frame), columns=['idx'])['idx'].values
+        ids = idx[defect_indices].astype(np.int64)
+    except FileNotFoundError:
+        logging.warning(f'... no per-atom table for {frame}, assuming atoms keep their order')
+        ids = defect_indices.astype(np.int64)
+    return ids, labels
+
+
+class LabelLookup:
+    """Reusable atom identifier -> component label array. Only the entries of
+    one frame are set at a time and reset afterwards, so each frame pair costs
+    O(number of defect atoms) rather than O(number of atoms)."""
+
+    def __init__(self):
+        self.labels = np.empty(0, dtype=np.int64)
+
+    def match(self, ids_a, ids_b, labels_b):
+        """Label in frame b of every atom in ids_a (-1 if it is not a defect atom there)."""
+        size = max(ids_a.max(initial=-1), ids_b.max(initial=-1)) + 1
+        if size > len(self.labels):
+            self.labels = np.concatenate([self.labels, np.full(size - len(self.labels), -1, dtype=np.int64)])
+        self.labels[ids_b] = labels_b
+        matched = self.labels[ids_a]
+        self.labels[ids_b] = -1
+        return matched
+
+
+def component_contingency(labels_a, matched, n_a, n_b):
+    """Sparse n_a x n_b matrix of shared atom counts between the components of two frames."""
+    shared = matched >= 0
+    return coo_matrix((np.ones(shared.sum(), dtype=np.int32), (labels_a[shared], matched[shared])),
+                      shape=(n_a, n_b)).tocsr().tocoo()
+
+
+def transition_events(C, sizes_a, sizes_b):
+    """Classify the overlaps of a contingency matrix into events.
+
+    Every overlapping pair of components is a merge if the later component
+    has several sources, else a split if the earlier one has several targets,
+    else a persist (same atoms) or migrate (partially shared atoms).
+    Components without overlap die or are born. Returns the event code,
+    source and target component (-1 if none) and overlap of every event.
+    """
+    successors = np.bincount(C.row, minlength=len(sizes_a))
+    predecessors = np.bincount(C.col, minlength=len(sizes_b))
+    unchanged = (C.data == sizes_a[C.row]) & (C.data == sizes_b[C.col])
+    event = np.where(predecessors[C.col] > 1, MERGE,
+                     np.where(successors[C.row] > 1, SPLIT, np.where(unchanged, PERSIST, MIGRATE)))
+
+    deaths = np.flatnonzero(successors == 0)
+    births = np.flatnonzero(predecessors == 0)
+    return (np.concatenate([event, np.full(len(deaths), DEATH), np.full(len(births), BIRTH)]),
+            np.concatenate([C.row, deaths, np.full(len(births), -1)]),
+            np.concatenate([C.col, np.full(len(deaths), -1), births]),
+            np.concatenate([C.data, np.zeros(len(deaths) + len(births), dtype=C.data.dtype)]))
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    # Frames with component metadata, in numeric frame order
+    all_frames = sorted([f[:-len('.meta.npz')] for f in os.listdir(op.join(args.path, 'components'))
+                         if f.endswith('.meta.npz')], key=frame_sort_key)
+    logging.info(f'{len(all_frames)} frames with components in {args.path}')
+
+    if not op.isdir(op.join(args.path, 'defects')):
+        os.mkdir(op.join(args.path, 'defects'))
+
+    # Walk consecutive frame pairs; every frame is loaded once
+    lookup = LabelLookup()
+    tables = []
+    ids_a, labels_a = load_components(args.path, all_frames[0]) if all_frames else (None, None)
+    for frame_a, frame_b in zip(all_frames[:-1], all_frames[1:]):
+        logging.info(f'Tracking components from {frame_a} to {frame_b}')
+        ids_b, labels_b = load_components(args.path, frame_b)
+        sizes_a = np.bincount(labels_a)
+        sizes_b = np.bincount(labels_b)
+
+        matched = lookup.match(ids_a, ids_b, labels_b)
+        C = component_contingency(labels_a, matched, len(sizes_a), len(sizes_b))
+        event, source, target, overlap = transition_events(C, sizes_a, sizes_b)
+
+        tables.append(pd.DataFrame({
+            'frame_from': frame_a, 'frame_to': frame_b,
+            'event': pd.Categorical.from_codes(event, EVENTS),
+            'component_from': source.astype(np.int32), 'component_to': target.astype(np.int32),
+            'overlap': overlap.astype(np.int32),
+            'nodes_from': np.where(source >= 0, sizes_a[np.maximum(source, 0)], 0).astype(np.int32),
+            'nodes_to': np.where(target >= 0, sizes_b[np.maximum(target, 0)], 0).astype(np.int32)}))
+        counts = tables[-1]['event'].value_counts()
+        logging.info('... ' + ', '.join(f'{counts[e]} {e}' for e in EVENTS))
+        ids_a, labels_a = ids_b, labels_b
+
+    # One event table for the whole trajectory
+    events = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(
+        columns=['frame_from', 'frame_to', 'event', 'component_from', 'component_to',
+                 'overlap', 'nodes_from', 'nodes_to'])
+    for column in ('frame_from', 'frame_to'):
+        events[column] = pd.Categorical(events[column], categories=all_frames, ordered=True)
+    events_path = op.join(args.path, 'defects', f'defect_events.{args.table_format}')
+    with atomic_output(events_path) as tmp_path:
+        if args.table_format == 'parquet':
+            events.to_parquet(tmp_path, index=False)
+        else:
+            events.to_csv(tmp_path, index=False)
+    logging.info(f'... {len(events)} events written to {events_path}')